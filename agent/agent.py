@@ -1,13 +1,104 @@
+import asyncio
+import functools
+import inspect
 import json
-from typing import Dict, Any, List
-from openai import OpenAI
+import os
+import re
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
+import fastjsonschema
+import httpx
+import orjson
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types.chat import ChatCompletion
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 from . import tools
+from .llm_cache import ResponseCache, SemanticPlanCache, cache_key
 
 # ---------------- CONFIG ----------------
 
 MODEL = "gpt-4.1-mini"
-client = OpenAI()
+# Routed (forced) tool-planning turns only emit tool_calls -> a cheaper model is enough.
+# Every turn that can produce user-facing text keeps the main model.
+PLANNING_MODEL = os.getenv("PLANNING_MODEL", "gpt-4o-mini")
+SYNTHESIS_MODEL = os.getenv("SYNTHESIS_MODEL", MODEL)
+EMBEDDING_MODEL = "text-embedding-3-small"
+PROMPT_CACHE_KEY = "ceo_agent_v1"
+BATCH_POLL_SECONDS = int(os.getenv("BATCH_POLL_SECONDS", "60"))
+# Planning-turn request coalescing window (0 disables the micro-batcher)
+MICRO_BATCH_WINDOW_MS = int(os.getenv("MICRO_BATCH_WINDOW_MS", "0"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+# Hard cap on model calls per conversation (guards against tool-call cycles)
+MAX_ITERS = int(os.getenv("MAX_ITERS", "8"))
+# After this many tool rounds the next call is forced to synthesize (tool_choice="none")
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
+
+# History windowing: once the prompt exceeds the budget, tool rounds older
+# than the last KEEP_TOOL_ROUNDS collapse into a truncated summary message.
+HISTORY_CHAR_BUDGET = int(os.getenv("HISTORY_CHAR_BUDGET", "60000"))
+KEEP_TOOL_ROUNDS = 2
+TOOL_SUMMARY_CHARS = 300
+TOOL_CONCURRENCY_LIMIT = int(os.getenv("TOOL_CONCURRENCY_LIMIT", "8"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+# Off by default: a replayed plan is only as good as the paraphrase match
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+response_cache = ResponseCache() if LLM_CACHE_ENABLED else None
+plan_cache = SemanticPlanCache() if SEMANTIC_CACHE_ENABLED else None
+# Shared HTTP/2 pool: concurrent sessions multiplex over warm TLS connections
+HTTP_LIMITS = httpx.Limits(
+    max_connections=200,
+    max_keepalive_connections=100,
+    keepalive_expiry=60,
+)
+# Pooled connections belong to the event loop that opened them, so there is
+# one client per loop (see _client)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# 429 / 5xx / connection drops: jittered exponential backoff, no thundering herd
+_retry_transient = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_random_exponential(min=1, max=20),
+    retry=retry_if_exception_type((RateLimitError, InternalServerError, APIConnectionError)),
+    reraise=True,
+)
+
+
+def _client() -> AsyncOpenAI:
+    """The AsyncOpenAI client (and HTTP/2 pool) for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        # Retries are owned by _retry_transient below, not by the SDK
+        client = AsyncOpenAI(
+            http_client=DefaultAsyncHttpxClient(http2=True, limits=HTTP_LIMITS),
+            max_retries=0,
+        )
+        _clients[loop] = client
+    return client
+
+
+class AgentIterationLimitError(RuntimeError):
+    """Raised when a conversation hits MAX_ITERS model calls without a final answer."""
+
+    def __init__(self, messages: List[Dict[str, Any]]):
+        super().__init__(f"Agent stopped after {MAX_ITERS} model calls without a final answer.")
+        self.messages = messages
+
 
 # ---------------- TOOL SCHEMAS ----------------
 
@@ -175,103 +266,624 @@ OPENAI_TOOLS = [
     },
 ]
 
+# ---------------- INTENT ROUTER ----------------
+
+# Unambiguous intents -> forced tool_choice, so the planning turn skips tool selection
+_ROUTES = [
+    (re.compile(r"\b(daily delta|today vs\.? yesterday|since yesterday)\b"), "tool_daily_delta"),
+    (re.compile(r"\b(monthly revenue|revenue by month|month[- ]over[- ]month)\b"), "tool_revenue_by_month"),
+    (re.compile(r"\b(growth quality|fake growth|real growth)\b"), "tool_interpret_growth_quality"),
+    (re.compile(r"\b(marketing efficiency|roas|ad spend)\b"), "tool_marketing_efficiency"),
+    (re.compile(r"\b(portfolio health|product portfolio)\b"), "tool_product_portfolio_health"),
+    (re.compile(r"\b(inventory|stockouts?|stock-outs?)\b"), "tool_inventory_health_vs_revenue"),
+    (re.compile(r"\bchannel (dependency|concentration|risk)\b"), "tool_channel_dependency_risk"),
+    (re.compile(r"\brecommend(ation)?s?\b"), "tool_generate_recommendations"),
+]
+
+def _route(user_text: str) -> Optional[str]:
+    """Tool name when exactly one intent matches; None (-> "auto") otherwise."""
+    text = user_text.lower()
+    matches = {name for pattern, name in _ROUTES if pattern.search(text)}
+    if len(matches) != 1:
+        return None
+    return matches.pop()
+
 # ---------------- TOOL EXECUTOR ----------------
 
-def execute_tool(name: str, arguments: Dict[str, Any]):
+# Whitelisted dispatch table, resolved once at import. Memoized tools dispatch
+# to their uncopied `.cached` result: execute_tool's only consumer serializes
+# it straight away (read-only), so the defensive deepcopy is skipped here.
+TOOL_NAMES = tuple(t["function"]["name"] for t in OPENAI_TOOLS)
+_DISPATCH: Dict[str, Callable] = {
+    name: getattr(getattr(tools, name), "cached", getattr(tools, name)) for name in TOOL_NAMES
+}
+_IS_ASYNC = {name: inspect.iscoroutinefunction(fn) for name, fn in _DISPATCH.items()}
+_TAKES_ARGS = {name: bool(inspect.signature(fn).parameters) for name, fn in _DISPATCH.items()}
+
+# Tools are in-memory pandas work (no sockets / DB handles / sleeps to make
+# async-native), so sync tools get their own bounded pool instead of
+# competing with the SDK for the loop's default executor.
+_TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(1, TOOL_CONCURRENCY_LIMIT),
+    thread_name_prefix="ceo-tool",
+)
+
+# Argument validators compiled from the same schemas the model sees
+_VALIDATORS: Dict[str, Callable] = {
+    t["function"]["name"]: fastjsonschema.compile(t["function"]["parameters"])
+    for t in OPENAI_TOOLS
+}
+
+# ---------------- PLAN CACHE GUARDS ----------------
+
+# Questions differing only by a number ("last 30 days" vs "last 90 days") embed
+# almost identically, so numeric questions never use the plan cache, and only
+# plans that run on schema-default arguments are stored.
+_HAS_NUMBER = re.compile(r"\d")
+_ARG_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    t["function"]["name"]: {
+        arg: spec.get("default")
+        for arg, spec in t["function"]["parameters"].get("properties", {}).items()
+    }
+    for t in OPENAI_TOOLS
+}
+
+def _replayable(tool_calls: List[Dict[str, Any]]) -> bool:
+    """True when every call passes no arguments or only their schema defaults."""
+    for call in tool_calls:
+        defaults = _ARG_DEFAULTS.get(call["function"]["name"])
+        if defaults is None:
+            return False
+        try:
+            args = orjson.loads(call["function"]["arguments"] or "{}")
+        except orjson.JSONDecodeError:
+            return False
+        if not isinstance(args, dict):
+            return False
+        if any(arg not in defaults or defaults[arg] != value for arg, value in args.items()):
+            return False
+    return True
+
+async def execute_tool(name: str, arguments: Dict[str, Any]):
+    """Run a whitelisted tool. The result may be a shared cached object: read it, don't mutate it."""
+    func = _DISPATCH.get(name)
+    if func is None:
+        return {"error": f"unknown tool: {name}"}
+
+    try:
+        arguments = _VALIDATORS[name](arguments)
+    except fastjsonschema.JsonSchemaException as e:
+        return {"error": f"bad args: {e.message}"}
+
     try:
-        func = getattr(tools, name)
-        return func(**arguments) if arguments else func()
+        kwargs = arguments if arguments and _TAKES_ARGS[name] else {}
+        if _IS_ASYNC[name]:
+            return await func(**kwargs)
+        # Sync tools run off the event loop so they don't block other sessions
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_TOOL_EXECUTOR, functools.partial(func, **kwargs))
     except Exception as e:
         return {"error": str(e)}
 
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _dumps(result: Any) -> str:
+    """Tool result -> JSON text (native orjson; stdlib json only as a fallback)."""
+    try:
+        return orjson.dumps(result, default=str, option=_ORJSON_OPTS).decode()
+    except TypeError:
+        return json.dumps(result, default=str)
+
+class _ToolRunner:
+    """
+    Per-conversation tool execution: bounded concurrency + memoized results.
+    Tools are pure over the loaded data, so repeats within a conversation
+    reuse the first (already serialized) result. Calls can be scheduled
+    early (while the model is still streaming) and collected later.
+    """
+
+    def __init__(self):
+        self._limit = asyncio.Semaphore(max(1, TOOL_CONCURRENCY_LIMIT))
+        self._results: Dict[Tuple[str, frozenset], asyncio.Future] = {}
+
+    async def _run(self, name: str, args: Dict[str, Any]) -> str:
+        async with self._limit:
+            result = await execute_tool(name, args)
+        return _dumps(result)
+
+    def schedule(self, call: Dict[str, Any]) -> asyncio.Future:
+        name = call["function"]["name"]
+        args = orjson.loads(call["function"]["arguments"] or b"{}")
+        key = (name, frozenset(args.items()))
+        if key not in self._results:
+            self._results[key] = asyncio.ensure_future(self._run(name, args))
+        return self._results[key]
+
+    async def run_all(self, tool_calls: List[Dict[str, Any]]) -> List[str]:
+        """Serialized results for tool_calls, in the same order."""
+
+        async def _result(call):
+            return await self.schedule(call)
+
+        results = await asyncio.gather(
+            *(_result(call) for call in tool_calls),
+            return_exceptions=True,
+        )
+        return [
+            _dumps({"error": str(r)}) if isinstance(r, Exception) else r
+            for r in results
+        ]
+
 # ---------------- SYSTEM PROMPT ----------------
 
 SYSTEM_PROMPT = """
-You are the AI CEO + Chief Analyst of the company — the operating system of the business.
-
-ABSOLUTE RULES (NON-NEGOTIABLE):
-- You ONLY use data returned by internal tools.
-- You NEVER invent, estimate, guess, or hallucinate numbers.
-- If required data is missing, you explicitly say so and stop.
-- You NEVER use external knowledge or assumptions.
-- You NEVER mix currencies.
-
-CURRENCY RULES (STRICT):
-- ALL monetary values are in Indian Rupees (₹).
-- You MUST prefix all monetary values with ₹.
-- You MUST NOT use $, USD, or any other currency symbol.
-- Currency fields include:
-  revenue, profit, net_profit, spend, CAC, total_cost,
-  selling_price, cogs, packaging_cost, logistics_cost.
-- Counts (units, days, stock, customers, percentages) are NOT currency.
-
-BEHAVIOR:
-- You think like a ruthless operator, not a chatbot.
-- You interpret facts, surface risks, and expose fragility.
-- You prioritize truth over optimism.
-- You highlight concentration risk, fake growth, inefficiencies, and breakpoints.
-- You do NOT soften bad news.
+You are the company's AI CEO + Chief Analyst: its executive brain, not an assistant.
+
+DATA:
+- Use ONLY internal tool data. Never invent, estimate or guess numbers; never use outside knowledge or assumptions.
+- If required data is missing, say so and stop.
+
+CURRENCY:
+- All money is Indian Rupees: prefix with ₹. Never use $, USD or any other currency; never mix currencies.
+- Money fields: revenue, profit, net_profit, spend, CAC, total_cost, selling_price, cogs, packaging_cost, logistics_cost.
+- Counts (units, days, stock, customers, percentages) are not money.
+
+STANCE:
+- Think like a ruthless operator: truth over optimism, no softened bad news.
+- Surface risks and fragility: concentration risk, fake growth, inefficiencies, breakpoints.
 
 AUTONOMY:
-- You automatically select and call the correct tools.
-- You NEVER ask the user for permission to run analysis.
-- You NEVER ask “Would you like me to…”.
-- You ALWAYS take the next logical analytical step.
-- You MUST complete interpretation before making any recommendation.
-- Recommendations must always be traceable to explicit flags or signals.
+- Select and call the right tools yourself; never ask permission or "Would you like me to…"; always take the next analytical step.
 
+OUTPUT:
+- Facts first, then implications, concisely.
+- For status/performance/health: what changed, why (if data supports it), what risk it creates.
+- Recommend only when asked, only after interpretation, and only via the recommendation tool (never in free text); each must trace to explicit flags or signals.
+"""
 
-OUTPUT CONSTRAINTS:
-- You report facts first.
-- You explain implications clearly and concisely.
-- You DO NOT give recommendations unless explicitly asked.
-- When recommendations are requested, you MUST generate them exclusively via the recommendation tool.
-- You MUST NOT generate recommendations directly in text.
+# Static per-request payload, built once at import.
+# Keep these byte-identical across turns (no timestamps / interpolation):
+# [system, tools] is the prompt prefix OpenAI caches between requests.
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+_TOOLS_JSON = json.dumps(OPENAI_TOOLS, sort_keys=True)
 
-- When asked for status, performance, or health, you report:
-  • What changed
-  • Why it changed (if data supports it)
-  • What risk it creates
+# ---------------- LLM CALL ----------------
 
-You are not an assistant.
-You are the company’s executive brain.
+@_retry_transient
+async def _open_stream(request: Dict[str, Any]):
+    return await _client().chat.completions.create(
+        **request,
+        # Routes every turn to the same prompt-cache bucket for the stable prefix
+        extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+    )
 
-"""
+async def _stream_completion(messages: List[Dict[str, Any]], model: str = MODEL,
+                             tool_choice="auto",
+                             runner: Optional[_ToolRunner] = None) -> AsyncIterator[Any]:
+    """
+    Streaming chat.completions.create behind an exact-match response cache.
+    Yields content deltas (str) as they arrive, then one final assistant
+    message dict {"content", "tool_calls"} once finish_reason is set.
 
-# ---------------- AGENT LOOP ----------------
+    With a runner, each tool_call is dispatched speculatively as soon as its
+    arguments form complete JSON, overlapping tool work with the rest of
+    the model's output.
+    """
+    request = {
+        "model": model,
+        "messages": messages,
+        "tools": OPENAI_TOOLS,
+        "tool_choice": tool_choice,
+        "stream": True,
+    }
 
-def run_ceo_agent(conversation: List[Dict[str, str]]):
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}] + conversation
+    key = None
+    if response_cache is not None:
+        # Tool schemas are pre-serialized; only the messages are encoded per call
+        key = cache_key({**request, "tools": _TOOLS_JSON})
+        # SQLite lookups block; keep them off the shared event loop
+        cached = await asyncio.to_thread(response_cache.get, key)
+        if cached is not None:
+            if cached["content"]:
+                yield cached["content"]
+            yield cached
+            return
 
-    while True:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            tools=OPENAI_TOOLS,
-            tool_choice="auto",
-        )
+    stream = await _open_stream(request)
+
+    content_parts = []
+    calls: Dict[int, Dict[str, Any]] = {}
+    dispatched = set()
+
+    def _dispatch_ready():
+        for index, call in calls.items():
+            if index in dispatched or not call["function"]["arguments"]:
+                continue
+            args = call["function"]["arguments"]
+            # Object arguments can only parse once the closing brace has arrived
+            if not args.rstrip().endswith("}"):
+                continue
+            try:
+                runner.schedule(call)
+            except (orjson.JSONDecodeError, TypeError, AttributeError):
+                continue
+            dispatched.add(index)
 
-        msg = response.choices[0].message
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+
+        if delta.content:
+            content_parts.append(delta.content)
+            yield delta.content
 
-        if msg.tool_calls:
-            messages.append({
-                "role": "assistant",
-                "tool_calls": msg.tool_calls,
+        # tool_calls arrive as fragments keyed by index
+        for frag in delta.tool_calls or []:
+            call = calls.setdefault(frag.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""},
             })
+            if frag.id:
+                call["id"] = frag.id
+            if frag.function is not None:
+                call["function"]["name"] += frag.function.name or ""
+                call["function"]["arguments"] += frag.function.arguments or ""
+
+        if runner is not None and delta.tool_calls:
+            _dispatch_ready()
+
+    message = {
+        "content": "".join(content_parts) or None,
+        "tool_calls": [calls[i] for i in sorted(calls)],
+    }
+    if key is not None:
+        await asyncio.to_thread(response_cache.set, key, message)
+    yield message
+
+async def _collect_completion(messages: List[Dict[str, Any]], model: str = MODEL,
+                              tool_choice="auto") -> Dict[str, Any]:
+    """Non-streaming view of _stream_completion: just the final message dict."""
+    message = None
+    async for chunk in _stream_completion(messages, model=model, tool_choice=tool_choice):
+        if not isinstance(chunk, str):
+            message = chunk
+    return message
+
+class _MicroBatcher:
+    """
+    Coalesces concurrent planning requests from many sessions.
+    Requests arriving within one window are grouped; identical requests
+    (same model, messages, tools, tool_choice) share a single API call,
+    and distinct ones go out in parallel over the shared HTTP/2 pool.
+    Results are routed back to each caller's future.
+    """
 
-            for call in msg.tool_calls:
-                name = call.function.name
-                args = json.loads(call.function.arguments or "{}")
-                result = execute_tool(name, args)
+    def __init__(self, window_ms: int, max_size: int):
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._loop = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = set()
 
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": call.id,
-                    "name": name,
-                    "content": json.dumps(result, default=str),
-                })
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The UI may drive each stream on a fresh event loop
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._spawn(self._collect())
 
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def submit(self, messages: List[Dict[str, Any]], model: str, tool_choice) -> Dict[str, Any]:
+        self._ensure_running()
+        key = cache_key({
+            "model": model,
+            "messages": messages,
+            "tools": _TOOLS_JSON,
+            "tool_choice": tool_choice,
+        })
+        future = self._loop.create_future()
+        await self._queue.put((key, (messages, model, tool_choice), future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[str, Tuple[Tuple, List[asyncio.Future]]] = {}
+            for key, args, future in batch:
+                groups.setdefault(key, (args, []))[1].append(future)
+
+            for args, futures in groups.values():
+                self._spawn(self._dispatch(args, futures))
+
+    async def _dispatch(self, args: Tuple, futures: List[asyncio.Future]):
+        messages, model, tool_choice = args
+        try:
+            message = await _collect_completion(messages, model=model, tool_choice=tool_choice)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future in futures:
+            if not future.done():
+                future.set_result(message)
+
+micro_batcher = (
+    _MicroBatcher(MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_SIZE)
+    if MICRO_BATCH_WINDOW_MS > 0 else None
+)
+
+async def _embed(text: str) -> Optional[List[float]]:
+    """
+    Embedding for the plan cache, or None if the call fails. The cache is
+    best-effort, so there are no retries here and errors fall back to normal planning.
+    """
+    try:
+        response = await _client().embeddings.create(model=EMBEDDING_MODEL, input=text)
+    except Exception:
+        return None
+    return response.data[0].embedding
+
+async def _apply_tool_calls(messages: List[Dict[str, Any]], tool_calls: List[Dict[str, Any]],
+                            runner: _ToolRunner, content: Optional[str] = None):
+    """
+    Append the assistant tool_calls turn (with any text the model wrote alongside
+    it, already shown to the user) and its tool replies to messages.
+    """
+    messages.append({
+        "role": "assistant",
+        "content": content,
+        "tool_calls": tool_calls,
+    })
+
+    results = await runner.run_all(tool_calls)
+
+    # Append in the original order (OpenAI expects tool replies to match tool_calls)
+    for call, result in zip(tool_calls, results):
+        messages.append({
+            "role": "tool",
+            "tool_call_id": call["id"],
+            "name": call["function"]["name"],
+            "content": result,
+        })
+
+    messages[:] = _window_history(messages)
+
+def _window_history(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse stale tool rounds (assistant tool_calls + their tool replies) into one
+    terse assistant message. System prompt, user turns and the most recent
+    KEEP_TOOL_ROUNDS rounds are left intact.
+    """
+    if sum(len(m.get("content") or "") for m in messages) <= HISTORY_CHAR_BUDGET:
+        return messages
+
+    rounds = [i for i, m in enumerate(messages) if m.get("tool_calls")]
+    stale = set(rounds[:-KEEP_TOOL_ROUNDS])
+    if not stale:
+        return messages
+
+    windowed = []
+    i = 0
+    while i < len(messages):
+        if i not in stale:
+            windowed.append(messages[i])
+            i += 1
             continue
 
-        messages.append({"role": "assistant", "content": msg.content})
-        return msg.content
+        # Tool replies must never be orphaned from their tool_calls message,
+        # so the whole round is replaced together.
+        # Text the model showed alongside the calls is kept verbatim.
+        said = messages[i].get("content")
+        parts = []
+        i += 1
+        while i < len(messages) and messages[i]["role"] == "tool":
+            parts.append(f"{messages[i]['name']}: {messages[i]['content'][:TOOL_SUMMARY_CHARS]}")
+            i += 1
+        summary = "Earlier tool results (truncated):\n" + "\n".join(parts)
+        windowed.append({
+            "role": "assistant",
+            "content": f"{said}\n\n{summary}" if said else summary,
+        })
+
+    return windowed
+
+# ---------------- AGENT LOOP ----------------
+# The async entry points below must be driven from one long-lived event loop
+# per process (ui/app.py runs them on a background loop). A client and its
+# pool only ever serve the loop they were created on, so a fresh loop per
+# call still works but reconnects every time.
+
+async def stream_ceo_agent(conversation: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Runs the agent loop, yielding answer text as the model streams it."""
+    messages = [_SYSTEM_MSG, *conversation]
+    runner = _ToolRunner()
+
+    # Planning turn: a paraphrase of an earlier opening question reuses its tool
+    # plan. Follow-ups depend on prior turns, so only one-message conversations
+    # are looked up (or stored), and never ones carrying a number.
+    query_embedding = None
+    planned_calls = None
+    if (plan_cache is not None and len(conversation) == 1 and conversation[0]["role"] == "user"
+            and not _HAS_NUMBER.search(conversation[0]["content"])):
+        query_embedding = await _embed(conversation[0]["content"])
+        if query_embedding is not None:
+            planned_calls = plan_cache.get(query_embedding)
+        if planned_calls is not None:
+            query_embedding = None
+
+    tool_choice: Any = "auto"
+    if planned_calls is None and conversation and conversation[-1]["role"] == "user":
+        routed = _route(conversation[-1]["content"])
+        if routed:
+            tool_choice = {"type": "function", "function": {"name": routed}}
+
+    tool_rounds = 0
+    # Text shown in an earlier round; the next round's text starts a new paragraph
+    shown_text = False
+    for _ in range(MAX_ITERS):
+        if planned_calls is not None:
+            tool_calls, planned_calls = planned_calls, None
+            content = None
+        else:
+            # The cheaper planner only when this call must emit a tool call (routed);
+            # any call that may answer the user directly stays on SYNTHESIS_MODEL
+            model = PLANNING_MODEL if isinstance(tool_choice, dict) else SYNTHESIS_MODEL
+            if tool_rounds >= MAX_TOOL_ROUNDS:
+                tool_choice = "none"
+            message = None
+            separate = shown_text
+            if micro_batcher is not None and not tool_rounds:
+                # Planning turns coalesce across sessions (no incremental streaming)
+                message = await micro_batcher.submit(messages, model, tool_choice)
+                if message["content"]:
+                    yield message["content"]
+            else:
+                async for chunk in _stream_completion(messages, model=model, tool_choice=tool_choice,
+                                                      runner=runner):
+                    if isinstance(chunk, str):
+                        if separate:
+                            yield "\n\n"
+                            separate = False
+                        yield chunk
+                    else:
+                        message = chunk
+            tool_choice = "auto"
+            content = message["content"]
+            tool_calls = message["tool_calls"]
+            shown_text = shown_text or bool(content)
+
+            if tool_calls and query_embedding is not None and _replayable(tool_calls):
+                await asyncio.to_thread(plan_cache.set, query_embedding, tool_calls)
+            query_embedding = None
+
+        if tool_calls:
+            await _apply_tool_calls(messages, tool_calls, runner, content)
+            tool_rounds += 1
+            continue
+
+        messages.append({"role": "assistant", "content": content})
+        return
+
+    raise AgentIterationLimitError(messages)
+
+async def run_ceo_agent(conversation: List[Dict[str, str]]) -> str:
+    """Non-streaming wrapper: the full final answer as one string."""
+    return "".join([chunk async for chunk in stream_ceo_agent(conversation)])
+
+# ---------------- BATCH (NON-INTERACTIVE) ----------------
+
+async def _submit_batch(requests: Dict[str, List[Dict[str, Any]]], model: str = MODEL,
+                        tool_choice: str = "auto") -> Dict[str, Any]:
+    """
+    One Batch API round: custom_id -> messages in, custom_id -> ChatCompletion out.
+    Requests that fail inside the batch map to None.
+    """
+    lines = [
+        json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": messages,
+                "tools": OPENAI_TOOLS,
+                "tool_choice": tool_choice,
+                "prompt_cache_key": PROMPT_CACHE_KEY,
+            },
+        }, default=str)
+        for custom_id, messages in requests.items()
+    ]
+
+    batch_file = await _client().files.create(
+        file=("ceo_agent_batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = await _client().batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await _client().batches.retrieve(batch.id)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} ended with status: {batch.status}")
+
+    output = await _client().files.content(batch.output_file_id)
+
+    results = {custom_id: None for custom_id in requests}
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        if row.get("error") or response.get("status_code") != 200:
+            continue
+        results[row["custom_id"]] = ChatCompletion.model_validate(response["body"])
+    return results
+
+async def run_ceo_agent_batch(conversations: List[List[Dict[str, str]]]) -> List[Any]:
+    """
+    Batch API variant of run_ceo_agent for scheduled reports (e.g. nightly briefs).
+    Half the token price in exchange for up to 24h latency per model round.
+    Tool calls returned by a round run locally; conversations that still
+    need the model go into the next batch. Returns final texts in input
+    order (None where the batch request failed or MAX_ITERS was reached).
+    """
+    pending = {
+        f"conversation-{i}": [_SYSTEM_MSG, *conversation]
+        for i, conversation in enumerate(conversations)
+    }
+    runners = {custom_id: _ToolRunner() for custom_id in pending}
+    answers: Dict[str, Any] = {custom_id: None for custom_id in pending}
+
+    # Every round runs with tool_choice "auto" (any reply may be the final
+    # answer), so all rounds stay on SYNTHESIS_MODEL
+    tool_rounds = 0
+    while pending and tool_rounds < MAX_ITERS:
+        tool_choice = "none" if tool_rounds >= MAX_TOOL_ROUNDS else "auto"
+        responses = await _submit_batch(pending, model=SYNTHESIS_MODEL, tool_choice=tool_choice)
+
+        next_round = {}
+        for custom_id, response in responses.items():
+            if response is None:
+                continue
+
+            msg = response.choices[0].message
+            messages = pending[custom_id]
+
+            if msg.tool_calls:
+                tool_calls = [call.model_dump() for call in msg.tool_calls]
+                await _apply_tool_calls(messages, tool_calls, runners[custom_id], msg.content)
+                next_round[custom_id] = messages
+                continue
+
+            messages.append({"role": "assistant", "content": msg.content})
+            answers[custom_id] = msg.content
+
+        pending = next_round
+        tool_rounds += 1
+
+    return [answers[f"conversation-{i}"] for i in range(len(conversations))]
@@ -1,6 +1,8 @@
+import importlib.util
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 # ------------------------------------------------------
 # Helper: load all datasets so functions can access them
@@ -19,13 +21,42 @@ class DataContext:
     marketing: pd.DataFrame
     inventory: pd.DataFrame
     unit: pd.DataFrame
-    sales_enriched: pd.DataFrame  # sales + unit costs columns
+    sales_enriched: pd.DataFrame  # sales + unit_cost + row cost columns
     daily: pd.DataFrame          # daily totals (fast baseline queries)
+    cube: pd.DataFrame           # (date, product, channel, region) -> revenue, units, cost
 
-def _read_csv(path: Path) -> pd.DataFrame:
+    # Memoized rollups (computed on first use; the context is read-only after load)
+    _profit_by_product: pd.DataFrame | None = field(default=None, repr=False)
+    _true_profit_by_channel: pd.DataFrame | None = field(default=None, repr=False)
+    _recent_perf: dict = field(default_factory=dict, repr=False)
+
+# Arrow's multi-threaded CSV parser when pyarrow is installed, else pandas' C engine.
+# Columns stay NumPy-backed: the analytics below lean on .to_numpy()/np.select/categoricals.
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+DATE_FORMAT = "%Y-%m-%d"  # what generate_world / simulate_day write
+
+def read_table(path: Path, parse_dates=None) -> pd.DataFrame:
+    """
+    Load a dataset CSV, or its typed Parquet copy from the generators while that is
+    at least as fresh as the CSV (the daily simulators append to the CSVs) or the
+    CSV is missing. Shared with generate_world so both apply the same rule.
+    """
+    parquet = path.with_suffix(".parquet")
+    if parquet.exists() and (not path.exists() or parquet.stat().st_mtime >= path.stat().st_mtime):
+        df = pd.read_parquet(parquet)
+        # Generators write categories in config order; sort them so groupby output
+        # comes out in the same (lexical) order as from a CSV read
+        for col in df.select_dtypes("category").columns:
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+        return df
     if not path.exists() or path.stat().st_size == 0:
         return pd.DataFrame()
-    return pd.read_csv(path)
+    return pd.read_csv(
+        path,
+        engine=CSV_ENGINE,
+        parse_dates=parse_dates,
+        date_format=DATE_FORMAT if parse_dates else None,
+    )
 
 def _validate(df: pd.DataFrame, name: str):
     missing = [c for c in REQUIRED[name] if c not in df.columns]
@@ -35,34 +66,69 @@ def _validate(df: pd.DataFrame, name: str):
 def load_context(data_dir="data") -> DataContext:
     data_dir = Path(data_dir)
 
-    sales = _read_csv(data_dir / "sales.csv")
-    marketing = _read_csv(data_dir / "marketing.csv")
-    inventory = _read_csv(data_dir / "inventory.csv")
-    unit = _read_csv(data_dir / "unit_economics.csv")
+    # Dates parsed during the read (no separate to_datetime pass)
+    sales = read_table(data_dir / "sales.csv", parse_dates=["date"])
+    marketing = read_table(data_dir / "marketing.csv", parse_dates=["date"])
+    inventory = read_table(data_dir / "inventory.csv", parse_dates=["date"])
+    unit = read_table(data_dir / "unit_economics.csv")
 
     _validate(sales, "sales")
     _validate(marketing, "marketing")
     _validate(inventory, "inventory")
     _validate(unit, "unit_economics")
 
-    # Parse dates ONCE
-    sales["date"] = pd.to_datetime(sales["date"])
-    marketing["date"] = pd.to_datetime(marketing["date"])
-    inventory["date"] = pd.to_datetime(inventory["date"])
+    # Count columns as int32 ONCE (half the bytes per groupby pass; sums still accumulate in int64).
+    # Money columns keep 64-bit so revenue/spend totals stay exact to the cent.
+    for df, cols in (
+        (sales, ["units_sold"]),
+        (marketing, ["impressions", "clicks", "conversions"]),
+        (inventory, ["opening_stock", "units_produced", "units_dispatched", "closing_stock", "lost_demand"]),
+    ):
+        for col in cols:
+            if pd.api.types.is_integer_dtype(df[col]):
+                df[col] = df[col].astype(np.int32)
+
+    # stockout_flag -> bool ONCE (accepts Yes/True/1 in any case; only distinct values are inspected)
+    flag = inventory["stockout_flag"]
+    yes = [v for v in flag.dropna().unique() if str(v).lower() in ("yes", "true", "1")]
+    inventory["stockout_flag"] = flag.isin(yes).to_numpy()
+
+    # Low-cardinality keys as category ONCE (groupbys hash int codes, not strings)
+    for col in ("product", "region", "channel"):
+        sales[col] = sales[col].astype("category")
+    marketing["channel"] = marketing["channel"].astype("category")
+    inventory["product"] = inventory["product"].astype("category")
+    unit["product"] = unit["product"].astype("category")
+
+    # Date-sorted frames ONCE, so time windows are a bisect + slice (see _date_window)
+    sales = sales.sort_values("date", kind="stable", ignore_index=True)
+    marketing = marketing.sort_values("date", kind="stable", ignore_index=True)
+    inventory = inventory.sort_values("date", kind="stable", ignore_index=True)
 
     # Enrich sales with unit costs ONCE (avoid repeated merges)
     unit = unit.copy()
     unit["unit_cost"] = unit["cogs"] + unit["packaging_cost"] + unit["logistics_cost"]
-    sales_enriched = sales.merge(unit[["product", "unit_cost"]], on="product", how="left")
+    # m:1 guards against duplicate unit-economics rows silently fanning out sales
+    sales_enriched = sales.merge(unit[["product", "unit_cost"]], on="product", how="left", validate="m:1")
+    # Product cost per row ONCE (every profit rollup just sums this column)
+    sales_enriched["cost"] = sales_enriched["unit_cost"].to_numpy() * sales_enriched["units_sold"].to_numpy()
+
+    # Pre-aggregated sales cube ONCE: every sales/profit rollup projects + sums from
+    # this instead of re-scanning row-level sales (date-sorted, like the source frames)
+    cube = (sales_enriched
+            .groupby(["date", "product", "channel", "region"], as_index=False, observed=True)
+            .agg(revenue=("revenue", "sum"),
+                 units=("units_sold", "sum"),
+                 cost=("cost", "sum")))
 
     # Daily totals table (fast baseline + anomalies)
-    daily = (sales.groupby("date", as_index=False)
-                  .agg(revenue=("revenue","sum"),
-                       units=("units_sold","sum")))
+    daily = (cube.groupby("date", as_index=False)
+                 .agg(revenue=("revenue","sum"),
+                      units=("units","sum")))
 
     return DataContext(
         sales=sales, marketing=marketing, inventory=inventory, unit=unit,
-        sales_enriched=sales_enriched, daily=daily
+        sales_enriched=sales_enriched, daily=daily, cube=cube
     )
 
 
@@ -72,18 +138,22 @@ def load_context(data_dir="data") -> DataContext:
 # SALES ANALYTICS
 # ------------------------------------------------------
 
+def _month_key(dates: pd.Series) -> np.ndarray:
+    """YYYYMM as int32 -- a cheap grouping key (no Period objects / per-row strings)."""
+    return dates.dt.year.to_numpy(dtype=np.int32) * 100 + dates.dt.month.to_numpy(dtype=np.int32)
+
+def _month_label(keys) -> list:
+    """YYYYMM int keys -> "YYYY-MM" strings (only for the small grouped result)."""
+    return [f"{k // 100:04d}-{k % 100:02d}" for k in keys]
+
 def revenue_by_month(ctx: DataContext):
-    df = ctx.sales.copy()
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    return (
-        df.groupby("month", as_index=False)["revenue"]
-          .sum()
-    )
+    out = ctx.cube["revenue"].groupby(_month_key(ctx.cube["date"])).sum()
+    return pd.DataFrame({"month": _month_label(out.index), "revenue": out.to_numpy()})
 
 
 def sales_by_region(ctx: DataContext):
     return (
-        ctx.sales
+        ctx.cube
         .groupby("region", as_index=False)["revenue"]
         .sum()
     )
@@ -91,14 +161,14 @@ def sales_by_region(ctx: DataContext):
 
 def sales_by_product(ctx: DataContext):
     return (
-        ctx.sales
+        ctx.cube
         .groupby("product", as_index=False)["revenue"]
         .sum()
     )
 
 def sales_by_channel(ctx: DataContext):
     return (
-        ctx.sales
+        ctx.cube
         .groupby("channel", as_index=False)["revenue"]
         .sum()
     )
@@ -131,22 +201,18 @@ def roas_by_channel(ctx: DataContext):
     Average ROAS per marketing channel.
     Used to detect inefficient spend and fake growth.
     """
-    df = ctx.marketing.copy()
-    df["ROAS"] = df["revenue"] / df["spend"].replace(0,pd.NA)
+    roas = (ctx.marketing["revenue"] / ctx.marketing["spend"].replace(0,pd.NA)).rename("ROAS")
     return (
-        df.groupby("channel")["ROAS"]
+        roas.groupby(ctx.marketing["channel"])
         .mean()
     )
 
 
 def spend_over_time(ctx: DataContext):
-    # ❗ FIX: Convert Period → string
-    df = ctx.marketing.copy()
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    return (
-        df.groupby("month")["spend"]
-        .sum()
-    )
+    # Group on int YYYYMM keys, label as "YYYY-MM" strings afterwards
+    out = ctx.marketing["spend"].groupby(_month_key(ctx.marketing["date"])).sum()
+    out.index = pd.Index(_month_label(out.index), name="month")
+    return out
 
 
 # ------------------------------------------------------
@@ -155,21 +221,16 @@ def spend_over_time(ctx: DataContext):
 
 def stockouts_by_product(ctx: DataContext):
     """Count how many days each product had a stockout."""
-    df = ctx.inventory.copy()
-    stockouts = df[df["stockout_flag"] == "Yes"]
-    return (
-        stockouts.groupby("product")["date"]
-        .nunique()
-        .reset_index()
-        .rename(columns={"date": "stockout_days"})
-    )
+    # One row per (date, product), so days == flagged rows: a bool sum, no per-product dedupe
+    flag = ctx.inventory["stockout_flag"].rename("stockout_days")
+    days = flag.groupby(ctx.inventory["product"]).sum()
+    return days[days > 0].reset_index()
 
 
 def avg_closing_stock(ctx: DataContext):
     """Average closing stock per product."""
-    df = ctx.inventory.copy()
     return (
-        df.groupby("product")["closing_stock"]
+        ctx.inventory.groupby("product")["closing_stock"]
         .mean()
         .reset_index()
         .rename(columns={"closing_stock": "avg_closing_stock"})
@@ -184,20 +245,24 @@ def profit_by_product(ctx: DataContext):
     """
     True profit by product (excluding marketing spend)
     """
-    df = ctx.sales_enriched.copy()
+    if ctx._profit_by_product is not None:
+        return ctx._profit_by_product
 
+    # Single groupby pass over the sales cube
     agg = (
-        df.groupby("product", as_index=False)
+        ctx.cube
+        .groupby("product", as_index=False)
         .agg(
             revenue=("revenue", "sum"),
-            units=("units_sold", "sum"),
-            total_cost=("unit_cost", lambda x: (x*df.loc[x.index, "units_sold"]).sum())
+            units=("units", "sum"),
+            total_cost=("cost", "sum"),
         )
     )
 
     agg["profit"] = agg["revenue"]-agg["total_cost"]
     agg["profit_margin_pct"] = agg["profit"]/agg["revenue"]*100
 
+    ctx._profit_by_product = agg
     return agg
 
 def true_profit_by_channel(ctx: DataContext):
@@ -205,18 +270,14 @@ def true_profit_by_channel(ctx: DataContext):
     Net profit by marketing channel:
     revenue - product costs - marketing spend
     """
-    df = ctx.sales_enriched.copy()
-    #Product costs per channel
-    cost_by_channel = (
-    df.assign(cost=df["unit_cost"] * df["units_sold"])
-      .groupby("channel", as_index=False)["cost"]
-      .sum()
-      .rename(columns={"cost": "product_cost"})
-    )
-
-
-    revenue_by_channel = (
-        df.groupby("channel", as_index=False)["revenue"].sum()
+    if ctx._true_profit_by_channel is not None:
+        return ctx._true_profit_by_channel
+
+    # Revenue + product costs per channel in one groupby pass
+    by_channel = (
+        ctx.cube
+          .groupby("channel", as_index=False)
+          .agg(revenue=("revenue", "sum"), product_cost=("cost", "sum"))
     )
 
     spend_by_channel = (
@@ -224,8 +285,7 @@ def true_profit_by_channel(ctx: DataContext):
     )
 
     merged = (
-        revenue_by_channel
-        .merge(cost_by_channel, on="channel", how="left")
+        by_channel
         .merge(spend_by_channel, on="channel", how="left")
         .fillna(0)
     )
@@ -238,19 +298,19 @@ def true_profit_by_channel(ctx: DataContext):
 
     merged["profit_margin_pct"] = merged["net_profit"]/merged["revenue"] * 100
 
+    ctx._true_profit_by_channel = merged
     return merged
 
 def true_profit_by_region(ctx: DataContext):
     """
     Net profit by region (excluding marketing spend)
     """
-    df = ctx.sales_enriched.copy()
-
     agg = (
-        df.groupby("region", as_index=False)
+        ctx.cube
+        .groupby("region", as_index=False)
         .agg(
             revenue = ("revenue", "sum"),
-            total_cost = ("unit_cost", lambda x: (x * df.loc[x.index, "units_sold"]).sum())
+            total_cost = ("cost", "sum")
         )
     )
 
@@ -303,20 +363,15 @@ def revenue_recent_performance(
 
     if ctx.daily.empty:
         return None
+    if n in ctx._recent_perf:
+        return ctx._recent_perf[n]
     
     latest = _latest_date(ctx)
-    start = latest - pd.Timedelta(days=n)
-
-    window = (
-        ctx.daily[
-            (ctx.daily["date"] > start) &
-            (ctx.daily["date"] <= latest)
-        ]
-        .sort_values("date")
-        .copy()
-    )
+    # daily comes out of a groupby on date, so it is already date-sorted
+    window = _date_window(ctx.daily, "date", latest, n)
 
     if len(window) < 2:
+        ctx._recent_perf[n] = None
         return None
     
     today_revenue = float(window.iloc[-1]["revenue"])
@@ -326,13 +381,14 @@ def revenue_recent_performance(
     if baseline_avg > 0:
         delta_pct = (today_revenue - baseline_avg) / baseline_avg * 100
 
-    return { 
+    ctx._recent_perf[n] = { 
         "window_days": n,
         "daily_series": window[["date", "revenue", "units"]],
         "baseline_avg": baseline_avg,
         "today_revenue": today_revenue,
         "delta_pct": delta_pct,
     }
+    return ctx._recent_perf[n]
 
 
 def daily_delta(ctx: DataContext):
@@ -354,6 +410,30 @@ def daily_delta(ctx: DataContext):
 # INTERPRETATION LAYER — Growth Quality
 # ------------------------------------------------------
 
+# Growth rules, first match wins: growing while unprofitable, growing on loss-makers,
+# healthy growth, no growth
+_GROWTH_UNPROFITABLE, _GROWTH_LOSS_DRIVEN, _GROWTH_HEALTHY, _GROWTH_NONE = range(4)
+_GROWTH_SIGNALS = np.array(["NEGATIVE", "NEGATIVE", "POSITIVE", "NEUTRAL"])
+
+def _growth_rule(deltas: np.ndarray, total_profit: float, loss_revenue_share: float) -> np.ndarray:
+    growing = deltas > 0  # NaN (no baseline) -> not growing
+    return np.select(
+        [growing & (total_profit <= 0), growing & (loss_revenue_share > 0.3), growing],
+        [_GROWTH_UNPROFITABLE, _GROWTH_LOSS_DRIVEN, _GROWTH_HEALTHY],
+        default=_GROWTH_NONE,
+    )
+
+def interpret_growth_quality_batch(
+        recent_deltas: np.ndarray,
+        total_profit: float,
+        loss_revenue_share: float
+) -> np.ndarray:
+    """
+    Vectorized growth signal for many revenue deltas (e.g. rolling windows)
+    against one precomputed profit picture. Returns an array of signal strings.
+    """
+    return _GROWTH_SIGNALS[_growth_rule(np.asarray(recent_deltas, dtype=float), total_profit, loss_revenue_share)]
+
 def interpret_growth_quality(
         recent_perf: dict,
         profit_by_product_df: pd.DataFrame
@@ -385,31 +465,35 @@ def interpret_growth_quality(
     )
 
     # ---- Decision Logic ----
+    rule = _growth_rule(
+        np.array([np.nan if revenue_delta is None else revenue_delta], dtype=float),
+        total_profit, loss_revenue_share
+    )[0]
 
-    if revenue_delta is not None and revenue_delta > 0:
-        if total_profit <= 0:
-            return {
-                "signal": "NEGATIVE",
-                "reason": "Revenue increased but overall profit is negative.",
-                "evidence": {
-                    "revenue_delta_pct": revenue_delta,
-                    "total_profit": total_profit,
-                },
-                "confidence": "HIGH"
-            }
+    if rule == _GROWTH_UNPROFITABLE:
+        return {
+            "signal": "NEGATIVE",
+            "reason": "Revenue increased but overall profit is negative.",
+            "evidence": {
+                "revenue_delta_pct": revenue_delta,
+                "total_profit": total_profit,
+            },
+            "confidence": "HIGH"
+        }
         
-        if loss_revenue_share > 0.3:
-            return {
-                "signal": "NEGATIVE",
-                "reason": "Revenue growth is driven by loss-making products.",
-                "evidence": {
-                    "revenue_delta_pct": revenue_delta,
-                    "loss_revenue_share": round(loss_revenue_share, 2),
-                    "loss_products": loss_products["product"].tolist()
-                },
-                "confidence": "HIGH"
-            }
+    if rule == _GROWTH_LOSS_DRIVEN:
+        return {
+            "signal": "NEGATIVE",
+            "reason": "Revenue growth is driven by loss-making products.",
+            "evidence": {
+                "revenue_delta_pct": revenue_delta,
+                "loss_revenue_share": round(loss_revenue_share, 2),
+                "loss_products": loss_products["product"].tolist()
+            },
+            "confidence": "HIGH"
+        }
         
+    if rule == _GROWTH_HEALTHY:
         return {
             "signal": "POSITIVE",
             "reason": "Revenue growth is supported by profitable products.",
@@ -433,10 +517,20 @@ def interpret_growth_quality(
 # INTERPRETATION LAYER — Marketing Efficiency
 # ------------------------------------------------------
 
+def _zeros_for_na(values: pd.Series) -> np.ndarray:
+    """float64 buffer with missing -> 0.0 in one pass (vs fillna(0).astype(float) chains)."""
+    return values.to_numpy(dtype=np.float64, na_value=0.0)
+
+def _hit_rows(df: pd.DataFrame, mask, *cols) -> list:
+    # (col, ...) tuples for the masked rows, zipped straight off the NumPy columns
+    hit = df.loc[mask]
+    return list(zip(*(hit[c].to_numpy() for c in cols)))
+
 def _date_window(df: pd.DataFrame, date_col:str, end: pd.Timestamp, days: int) -> pd.DataFrame:
-    """Inclusive window: (end-days,end)."""
+    """Inclusive window: (end-days,end]. `df` must be sorted by `date_col` (load_context does this)."""
     start = end - pd.Timedelta(days=days)
-    return df[(df[date_col] > start) & (df[date_col] <= end)].copy()
+    lo, hi = df[date_col].searchsorted([start, end], side="right")
+    return df.iloc[lo:hi]
 
 def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
                          min_roas: float = 2.0,
@@ -458,7 +552,7 @@ def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
     latest = _latest_date(ctx)
 
     m = _date_window(ctx.marketing, "date", latest, lookback_days)
-    s = _date_window(ctx.sales_enriched, "date", latest, lookback_days)
+    s = _date_window(ctx.cube, "date", latest, lookback_days)
 
     if m.empty:
         return {
@@ -480,11 +574,11 @@ def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
             impressions=("impressions", "sum"),
         )
     )
-    roll["roas"] = roll["mkt_revenue"] / roll["spend"].replace(0, pd.NA)
-    roll["cac"] = roll["spend"] / roll["conversions"].replace(0, pd.NA)
+    roll["roas"] = roll["mkt_revenue"] / roll["spend"].replace(0, np.nan)
+    roll["cac"] = roll["spend"] / roll["conversions"].replace(0, np.nan)
 
     # --- True net profit per channel using sales mix + unit_cost + marketing spend ---
-    # product cost and sales revenue come from sales_enriched
+    # product cost and sales revenue come from the sales cube
     if s.empty:
         channel_table = roll
         flags = [{"type": "NO_SALES_DATA_WINDOW", "severity": "high"}]
@@ -501,8 +595,8 @@ def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
         s.groupby("channel", as_index=False)
         .agg(
             sales_revenue=("revenue", "sum"),
-            units=("units_sold","sum"),
-            product_cost=("unit_cost", lambda x: (x * s.loc[x.index, "units_sold"]).sum()),
+            units=("units","sum"),
+            product_cost=("cost", "sum"),
         )
     )
 
@@ -511,13 +605,13 @@ def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
     )
 
     channel_table["net_profit"] = (
-        channel_table["sales_revenue"].fillna(0)
-        - channel_table["product_cost"].fillna(0)
-        - channel_table["spend"].fillna(0)
+        _zeros_for_na(channel_table["sales_revenue"])
+        - _zeros_for_na(channel_table["product_cost"])
+        - _zeros_for_na(channel_table["spend"])
     )
 
     channel_table["net_profit_margin_pct"] = (
-        channel_table["net_profit"] / channel_table["sales_revenue"].replace(0, pd.NA) * 100
+        channel_table["net_profit"] / channel_table["sales_revenue"].replace(0, np.nan) * 100
     )
 
     # --- Simple "trend" check: compare last half vs first half of window ---
@@ -525,23 +619,25 @@ def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
     first = _date_window(ctx.marketing, "date", latest - pd.Timedelta(days=half), half)
     last = _date_window(ctx.marketing, "date", latest, half)
 
-    def _sum_by_channel(df, col):
+    def _sums(df):
+        # spend + revenue per channel in one groupby pass
         if df.empty:
-            return pd.DataFrame(columns=["channel", col])
-        return df.groupby("channel", as_index=False)[col].sum()
-    
-    spend_first = _sum_by_channel(first, "spend").rename(columns={"spend":"spend_first"})
-    spend_last = _sum_by_channel(last, "spend").rename(columns={"spend":"spend_last"})
-    rev_first = _sum_by_channel(first, "revenue").rename(columns={"revenue":"rev_first"})
-    rev_last = _sum_by_channel(last, "revenue").rename(columns={"revenue":"rev_last"})
-
-    trend = spend_first.merge(spend_last, on="channel", how="outer") \
-                       .merge(rev_first, on="channel", how="outer") \
-                       .merge(rev_last, on="channel", how="outer") \
-                       .fillna(0)
+            return pd.DataFrame(columns=["spend", "revenue"], index=pd.Index([], name="channel"))
+        return df.groupby("channel")[["spend", "revenue"]].sum()
+
+    first_agg = _sums(first).rename(columns={"spend": "spend_first", "revenue": "rev_first"})
+    last_agg = _sums(last).rename(columns={"spend": "spend_last", "revenue": "rev_last"})
+
+    # Index-aligned outer concat of the two halves
+    trend = (
+        pd.concat([first_agg, last_agg], axis=1)
+        .fillna(0)
+        .rename_axis("channel")
+        .reset_index()
+    )
     
-    trend["spend_change_pct"] = (trend["spend_last"] - trend["spend_first"]) / trend["spend_first"].replace(0, pd.NA) * 100
-    trend["rev_change_pct"] = (trend["rev_last"] - trend["rev_first"]) / trend["rev_first"].replace(0, pd.NA) * 100
+    trend["spend_change_pct"] = (trend["spend_last"] - trend["spend_first"]) / trend["spend_first"].replace(0, np.nan) * 100
+    trend["rev_change_pct"] = (trend["rev_last"] - trend["rev_first"]) / trend["rev_first"].replace(0, np.nan) * 100
 
     channel_table = channel_table.merge(trend[["channel", "spend_change_pct", "rev_change_pct"]], on="channel", how="left")
 
@@ -549,30 +645,36 @@ def marketing_efficiency(ctx: DataContext, lookback_days: int = 30,
     flags = []
     interpretation = []
 
-    for _, r in channel_table.iterrows():
-        ch = r["channel"]
-        roas = r.get("roas")
-        npm = r.get("net_profit_margin_pct")
-        spend_chg = r.get("spend_change_pct")
+    # Threshold checks as whole-column masks (NaN compares False)
+    low_roas = channel_table["roas"].lt(min_roas)
+    low_npm = channel_table["net_profit_margin_pct"].lt(min_profit_margin_pct)
+    # Spend spike without revenue following: revenue change missing or lower than spend change
+    spike = channel_table["spend_change_pct"].ge(spend_spike_pct) & (
+        channel_table["rev_change_pct"].isna()
+        | channel_table["rev_change_pct"].lt(channel_table["spend_change_pct"])
+    )
+    hit = low_roas | low_npm | spike
+
+    # Only rows that tripped at least one check are visited (channel order preserved)
+    rows = channel_table.loc[hit, ["channel", "roas", "net_profit_margin_pct", "spend_change_pct", "rev_change_pct"]]
+    for (ch, roas, npm, spend_chg, rev_chg), is_low_roas, is_low_npm, is_spike in zip(
+            rows.itertuples(index=False, name=None), low_roas[hit], low_npm[hit], spike[hit]):
 
         # Low ROAS
-        if pd.notna(roas) and roas < min_roas:
+        if is_low_roas:
             flags.append({"type": "LOW_ROAS", "channel": ch, "severity": "medium", "value": float(roas), "threshold": min_roas})
             interpretation.append(f"{ch}: ROAS below target ({float(roas):.2f} < {min_roas}).")
 
         # Profit leakage (revenue looks fine but net profit is negative / margin below target)
-        if pd.notna(npm) and npm < min_profit_margin_pct:
+        if is_low_npm:
             flags.append({"type": "NEGATIVE_OR_LOW_NET_MARGIN", "channel":ch, "severity": "high", "value": float(npm), "threshold": min_profit_margin_pct})
             interpretation.append(f"{ch}: Net profit margin is below target ({float(npm):.2f}% < {min_profit_margin_pct}%). This suggests spend + product mix is not profitable.")
 
         # Spend spike without revenue following
-        if pd.notna(spend_chg) and spend_chg >= spend_spike_pct:
-            # if revenue change is lower than spend change, flag inefficiency
-            rev_chg = r.get("rev_change_pct")
-            if pd.isna(rev_chg) or rev_chg < spend_chg:
-                flags.append({"type": "SPEND_SPIKE_WEAK_RETURN", "channel": ch, "severity": "medium",
-                              "spend_change_pct": float(spend_chg), "rev_change_pct": (None if pd.isna(rev_chg) else float(rev_chg))})
-                interpretation.append(f"{ch}: Spend jumped (~{float(spend_chg):.1f}%), but revenue didn't keep up. Potential diminishing returns / targeting fatigue.")
+        if is_spike:
+            flags.append({"type": "SPEND_SPIKE_WEAK_RETURN", "channel": ch, "severity": "medium",
+                          "spend_change_pct": float(spend_chg), "rev_change_pct": (None if pd.isna(rev_chg) else float(rev_chg))})
+            interpretation.append(f"{ch}: Spend jumped (~{float(spend_chg):.1f}%), but revenue didn't keep up. Potential diminishing returns / targeting fatigue.")
     
     # If no issues, still return a "green" summary
     if not flags:
@@ -603,6 +705,7 @@ def product_portfolio_health(
     if latest is None:
         return None
     
+    # Copy: the memoized table is shared, and columns are added below
     df = profit_by_product(ctx).copy()
 
     total_revenue = df["revenue"].sum()
@@ -612,50 +715,44 @@ def product_portfolio_health(
     # --- Revenue share ---
     df["revenue_share_pct"] = df["revenue"] / total_revenue * 100
 
-    # --- Product classification ---
-    def classify(row):
-        if row["revenue_share_pct"] >= high_revenue_share_pct and row["profit_margin_pct"] >= min_good_margin_pct:
-            return "STAR"
-        if row["revenue_share_pct"] < high_revenue_share_pct and row["profit_margin_pct"] >= min_good_margin_pct:
-            return "CASH_COW"
-        if row["revenue_share_pct"] >= high_revenue_share_pct and row["profit_margin_pct"] < 0:
-            return "FAKE_GROWTH"
-        if row["revenue_share_pct"] < 5 and row["profit_margin_pct"] < min_good_margin_pct:
-            return "ZOMBIE"
-        return "EXPERIMENTAL"
-    
-    df["category"] = df.apply(classify, axis=1)
+    # --- Product classification (first matching rule wins) ---
+    rs = df["revenue_share_pct"].to_numpy()
+    pm = df["profit_margin_pct"].to_numpy()
+    conds = [
+        (rs >= high_revenue_share_pct) & (pm >= min_good_margin_pct),
+        (rs < high_revenue_share_pct) & (pm >= min_good_margin_pct),
+        (rs >= high_revenue_share_pct) & (pm < 0),
+        (rs < 5) & (pm < min_good_margin_pct),
+    ]
+    df["category"] = np.select(
+        conds, ["STAR", "CASH_COW", "FAKE_GROWTH", "ZOMBIE"], default="EXPERIMENTAL"
+    )
 
     # --- Flags + interpretations ---
     flags = []
     interpretation =[]
 
     # Revenue concentration
-    dominant = df[df["revenue_share_pct"] >= high_revenue_share_pct]
-    if not dominant.empty:
-        for _, r in dominant.iterrows():
-            flags.append({
-                "type": "PRODUCT_REVENUE_CONCENTRATION",
-                "product": r["product"],
-                "revenue_share_pct": float(r["revenue_share_pct"]),
-                "severity": "medium"
-            })
-            interpretation.append(
-                f"{r['product']} contributes {r['revenue_share_pct']:.1f}% of total revenue. Portfolio may be overly dependent."
-            )
+    dominant = _hit_rows(df, df["revenue_share_pct"] >= high_revenue_share_pct, "product", "revenue_share_pct")
+    flags.extend(
+        {"type": "PRODUCT_REVENUE_CONCENTRATION", "product": product, "revenue_share_pct": float(share), "severity": "medium"}
+        for product, share in dominant
+    )
+    interpretation.extend(
+        f"{product} contributes {share:.1f}% of total revenue. Portfolio may be overly dependent."
+        for product, share in dominant
+    )
     
     # Fake growth products
-    fake = df[df["category"] == "FAKE_GROWTH"]
-    for _, r in fake.iterrows():
-        flags.append({
-            "type": "FAKE_GROWTH_PRODUCT",
-            "product": r["product"],
-            "profit_margin_pct": float(r["profit_margin_pct"]),
-            "severity": "high"
-        })
-        interpretation.append(
-            f"{r['product']} has high revenue but negative margins. Growth here is destroying value"
-        )
+    fake = _hit_rows(df, df["category"] == "FAKE_GROWTH", "product", "profit_margin_pct")
+    flags.extend(
+        {"type": "FAKE_GROWTH_PRODUCT", "product": product, "profit_margin_pct": float(margin), "severity": "high"}
+        for product, margin in fake
+    )
+    interpretation.extend(
+        f"{product} has high revenue but negative margins. Growth here is destroying value"
+        for product, margin in fake
+    )
     
     if not flags:
         interpretation.append("Product portoflio shows no major structural health risks under current thresholds.")
@@ -697,7 +794,7 @@ def inventory_health_vs_revenue(
         return None
     
     inv = _date_window(ctx.inventory, "date", latest, lookback_days)
-    sales = _date_window(ctx.sales, "date", latest, lookback_days)
+    sales = _date_window(ctx.cube, "date", latest, lookback_days)
 
     if inv.empty:
         return {
@@ -711,43 +808,31 @@ def inventory_health_vs_revenue(
     # --- Sales daily revenue per product (date, product) ---
     sales_day = (
         sales.groupby(["date", "product"], as_index=False)
-        .agg(revenue=("revenue", "sum"), units_sold=("units_sold", "sum"))
+        .agg(revenue=("revenue", "sum"), units_sold=("units", "sum"))
     )
 
     # --- Inventory status per product-day ---
     inv_day = inv[[
         "date", "product", "lost_demand", "stockout_flag", "closing_stock", "units_dispatched"
     ]].copy()
-    inv_day["lost_demand"] = (
-        inv_day.get("lost_demand", 0)
-           .fillna(0)
-           .astype(float)
-    )
+    inv_day["lost_demand"] = _zeros_for_na(inv_day["lost_demand"])
 
-    # Normalize stockout_flag to boolean
-    inv_day["is_stockout"] = inv_day["stockout_flag"].astype(str).str.lower().isin(["yes", "true", "1"])
-    inv_day["is_low_stock"] = inv_day["closing_stock"].fillna(0) <= low_stock_threshold
+    # stockout_flag is already boolean (normalized in load_context)
+    inv_day["is_stockout"] = inv_day["stockout_flag"].to_numpy()
+    inv_day["is_low_stock"] = _zeros_for_na(inv_day["closing_stock"]) <= low_stock_threshold
 
     # --- Merge to connect stoc reality to revenue outcome ---
     merged = inv_day.merge(sales_day, on=["date", "product"], how="left")
-    merged["revenue"] = merged["revenue"].fillna(0.0)
-    merged["units_sold"] = merged["units_sold"].fillna(0.0)
-
-    merged["realized_price"] = (
-        merged.groupby("product")["revenue"].transform("sum") /
-        merged.groupby("product")["units_sold"].transform("sum")
-    )
+    merged["revenue"] = _zeros_for_na(merged["revenue"])
+    merged["units_sold"] = _zeros_for_na(merged["units_sold"])
 
-    merged["realized_price"] = merged["realized_price"].fillna(0.0)
+    # One groupby for both sums, broadcast back with a single map
+    totals = merged.groupby("product").agg(rev_sum=("revenue", "sum"), units_sum=("units_sold", "sum"))
+    price = (totals["rev_sum"] / totals["units_sum"].replace(0, np.nan)).fillna(0.0)
+    merged["realized_price"] = merged["product"].map(price).astype(float).to_numpy()
 
 
     # --- Aggregate per product ---
-    def _avg_revenue(df, mask):
-        sub = df[mask]
-        if sub.empty:
-            return pd.NA
-        return float(sub["revenue"].mean())
-    
     merged["lost_revenue_estimate"] = 0.0
     mask = merged["is_stockout"] & (merged["lost_demand"] > 0)
 
@@ -756,36 +841,42 @@ def inventory_health_vs_revenue(
         merged.loc[mask, "realized_price"]
     )
 
-    
-    rows = []
-    for product, g in merged.groupby("product"):
-        stockout_days = int(g["is_stockout"].sum())
-        low_stock_days = int(g["is_low_stock"].sum())
-        total_days = int(g["date"].nunique())
-
-        avg_rev_stockout = _avg_revenue(g, g["is_stockout"])
-        avg_rev_normal = _avg_revenue(g, ~g["is_stockout"])
-        lost_units = int(g.loc[g["is_stockout"], "lost_demand"].sum())
-        lost_revenue = float(g.loc[g["is_stockout"], "lost_revenue_estimate"].sum())
-
-
-        impact_pct = pd.NA
-        if pd.notna(avg_rev_normal) and avg_rev_normal > 0 and pd.notna(avg_rev_stockout):
-            impact_pct = (avg_rev_normal - avg_rev_stockout) / avg_rev_normal * 100.0
-
-        rows.append({
-            "product": product,
-            "days_observed": total_days,
-            "stockout_days": stockout_days,
-            "low_stock_days": low_stock_days,
-            "avg_daily_revenue_non_stockout": avg_rev_normal,
-            "avg_daily_revenue_stockout": avg_rev_stockout,
-            "revenue_drop_pct_on_stockout": impact_pct,
-            "lost_units_estimated": lost_units,
-            "lost_revenue_estimated": lost_revenue,
-        })
+    # Single sweep per aggregate: bincount over product codes (C loop, no per-group dispatch)
+    codes, products = pd.factorize(merged["product"], sort=True)
+    n_products = len(products)
+
+    def _per_product(weights=None):
+        return np.bincount(codes, weights=weights, minlength=n_products)
+
+    so = merged["is_stockout"].to_numpy()
+    revenue = merged["revenue"].to_numpy(dtype=np.float64)
+    stockout_days = _per_product(so)
+    normal_days = _per_product(~so)
+    first_seen = ~merged.duplicated(["product", "date"]).to_numpy()
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_rev_stockout = _per_product(revenue * so) / stockout_days
+        avg_rev_normal = _per_product(revenue * ~so) / normal_days
+
+    product_table = pd.DataFrame({
+        "product": products,
+        "days_observed": np.bincount(codes[first_seen], minlength=n_products),
+        "stockout_days": stockout_days.astype(int),
+        "low_stock_days": _per_product(merged["is_low_stock"].to_numpy()).astype(int),
+        "avg_daily_revenue_non_stockout": avg_rev_normal,
+        "avg_daily_revenue_stockout": avg_rev_stockout,
+        "lost_units_estimated": _per_product(merged["lost_demand"].to_numpy() * so).astype(int),
+        # lost_revenue_estimate is already zero outside stockout days
+        "lost_revenue_estimated": _per_product(merged["lost_revenue_estimate"].to_numpy()),
+    })
+
+    normal = product_table["avg_daily_revenue_non_stockout"]
+    product_table.insert(
+        6, "revenue_drop_pct_on_stockout",
+        ((normal - product_table["avg_daily_revenue_stockout"]) / normal * 100.0).where(normal > 0),
+    )
 
-    product_table = pd.DataFrame(rows).sort_values(
+    product_table = product_table.sort_values(
         ["stockout_days", "revenue_drop_pct_on_stockout"],  ascending=False
     )
 
@@ -793,13 +884,20 @@ def inventory_health_vs_revenue(
     flags = []
     interpretation = []
 
-    for _, r in product_table.iterrows():
-        p = r["product"]
-        so_days = int(r["stockout_days"])
-        drop = r["revenue_drop_pct_on_stockout"]
+    # Threshold checks as whole-column masks (missing drop compares False)
+    frequent = product_table["stockout_days"].ge(stockout_days_threshold)
+    impact = product_table["revenue_drop_pct_on_stockout"].ge(revenue_impact_threshold_pct)
+    pressure = product_table["low_stock_days"].ge(stockout_days_threshold) & ~frequent
+    hit = frequent | impact | pressure
+
+    # Only products that tripped at least one check are visited (table order preserved)
+    rows = product_table.loc[hit, ["product", "stockout_days", "revenue_drop_pct_on_stockout", "low_stock_days"]]
+    for (p, so_days, drop, low_days), is_frequent, is_impact, is_pressure in zip(
+            rows.itertuples(index=False, name=None), frequent[hit], impact[hit], pressure[hit]):
+        so_days = int(so_days)
 
         # Frequent stockouts
-        if so_days >= stockout_days_threshold:
+        if is_frequent:
             flags.append({
                 "type": "FREQUENT_STOCKOUTS",
                 "product": p,
@@ -812,7 +910,7 @@ def inventory_health_vs_revenue(
             )
 
         # Revenue impact when stockout happens
-        if pd.notna(drop) and drop >= revenue_impact_threshold_pct:
+        if is_impact:
             flags.append({
                 "type": "STOCKOUT_REVENUE_IMPACT",
                 "product": p,
@@ -825,12 +923,12 @@ def inventory_health_vs_revenue(
             )
         
         # Low-stock pressure warning (even if not full stockout)
-        if int(r["low_stock_days"]) >= stockout_days_threshold and so_days < stockout_days_threshold:
+        if is_pressure:
             flags.append({
                 "type": "LOW_STOCK_PRESSURE",
                 "product": p,
                 "severity": "medium",
-                "low_stock_days": int(r["low_stock_days"]),
+                "low_stock_days": int(low_days),
                 "low_stock_threshold": float(low_stock_threshold),
             })
             interpretation.append(
@@ -852,6 +950,9 @@ def inventory_health_vs_revenue(
 # INTERPRETATION LAYER — Channel Dependency Risk
 # ------------------------------------------------------
 
+# Rows of channel_table handed back for display; flags still cover every channel
+CHANNEL_TABLE_ROWS = 10
+
 def channel_dependency_risk(
         ctx: DataContext,
         max_revenue_share_pct: float = 50.0,
@@ -867,6 +968,7 @@ def channel_dependency_risk(
     if latest is None:
         return None
     
+    # Copy: the memoized table is shared, and columns are added below
     df = true_profit_by_channel(ctx).copy()
     if df.empty:
         return None
@@ -884,50 +986,41 @@ def channel_dependency_risk(
     interpretation = []
 
     # --- Revenue concentration ---
-    for _, r in df.iterrows():
-        if r["revenue_share_pct"] >= max_revenue_share_pct:
-            flags.append({
-                "type": "CHANNEL_REVENUE_CONCENTRATION",
-                "channel": r["channel"],
-                "severity": "medium",
-                "revenue_share_pct": float(r["revenue_share_pct"]),
-            })
-            interpretation.append(
-                f"{r['channel']} contributes {r['revenue_share_pct']:.1f}% of total revenue. "
-                "Business may be overly dependent on this channel."
-            )
+    rev_rows = _hit_rows(df, df["revenue_share_pct"] >= max_revenue_share_pct, "channel", "revenue_share_pct")
+    flags.extend(
+        {"type": "CHANNEL_REVENUE_CONCENTRATION", "channel": ch, "severity": "medium", "revenue_share_pct": float(pct)}
+        for ch, pct in rev_rows
+    )
+    interpretation.extend(
+        f"{ch} contributes {pct:.1f}% of total revenue. "
+        "Business may be overly dependent on this channel."
+        for ch, pct in rev_rows
+    )
     
     # --- Profit concentration ---
-    for _, r in df.iterrows():
-        if r["profit_share_pct"] >= max_profit_share_pct:
-            flags.append({
-                "type": "PROFIT_CONCENTRATION",
-                "channel": r["channel"],
-                "severity": "high",
-                "profit_share_pct": float(r["profit_share_pct"]),
-            })
-            interpretation.append(
-                f"{r['channel']} contributes {r['profit_share_pct']:.1f}% of total profit. "
-                "Profitability is fragile if this channel degrades. "
-            )
+    profit_rows = _hit_rows(df, df["profit_share_pct"] >= max_profit_share_pct, "channel", "profit_share_pct")
+    flags.extend(
+        {"type": "PROFIT_CONCENTRATION", "channel": ch, "severity": "high", "profit_share_pct": float(pct)}
+        for ch, pct in profit_rows
+    )
+    interpretation.extend(
+        f"{ch} contributes {pct:.1f}% of total profit. "
+        "Profitability is fragile if this channel degrades. "
+        for ch, pct in profit_rows
+    )
     
     # --- ROAS illusion: looks good but destroys value ---
-    illusion = df[
-        (df["profit_margin_pct"] < 0)
-        & (df["revenue"] > 0)
-    ]
-
-    for _, r in illusion.iterrows():
-        flags.append({
-            "type": "ROAS_ILLUSIONS",
-            "channel": r["channel"],
-            "severity": "high",
-            "profit_margin_pct": float(r["profit_margin_pct"]),
-        })
-        interpretation.append(
-            f"{r['channel']} generates revenue but has negative net margin. "
-            "This channel may appear efficient but is destroying value."
-        )
+    illusion_rows = _hit_rows(df, (df["profit_margin_pct"] < 0) & (df["revenue"] > 0),
+                              "channel", "profit_margin_pct")
+    flags.extend(
+        {"type": "ROAS_ILLUSIONS", "channel": ch, "severity": "high", "profit_margin_pct": float(margin)}
+        for ch, margin in illusion_rows
+    )
+    interpretation.extend(
+        f"{ch} generates revenue but has negative net margin. "
+        "This channel may appear efficient but is destroying value."
+        for ch, margin in illusion_rows
+    )
     
     # --- Single healthy channel risk ---
     healthy = df[df["profit_margin_pct"] >= min_healthy_margin_pct]
@@ -949,7 +1042,7 @@ def channel_dependency_risk(
     
     return {
         "as_of": latest.date().isoformat(),
-        "channel_table": df.sort_values("revenue", ascending=False),
+        "channel_table": df.nlargest(CHANNEL_TABLE_ROWS, "revenue"),
         "flags": flags,
         "interpretation": interpretation,
     }
@@ -958,6 +1051,114 @@ def channel_dependency_risk(
 # RECOMMENDATION LAYER — FLAG & SIGNAL DRIVEN
 # ------------------------------------------------------
 
+# Recommendation text per flag type. "{e}" is filled from the flag's `field`
+# (channel / product); "entity": False keeps that key off the recommendation.
+_DIVERSIFY_CHANNELS = {
+    "scope": "company",
+    "field": None,
+    "recommendation": "Diversify revenue sources across additional channels.",
+    "expected_impact": "Reduces single-point-of-failure risk.",
+    "risk_tradeoff": "New channels may be inefficient initially.",
+    "confidence": "MEDIUM",
+}
+
+TEMPLATES = {
+    # --- MARKETING EFFICIENCY ---
+    "LOW_ROAS": {
+        "scope": "channel",
+        "field": "channel",
+        "recommendation": "Reduce or pause spend on {e} until ROAS improves.",
+        "expected_impact": "Stops inefficient capital burn.",
+        "risk_tradeoff": "Short-term revenue decline possible.",
+        "confidence": "HIGH",
+    },
+    "NEGATIVE_OR_LOW_NET_MARGIN": {
+        "scope": "channel",
+        "field": "channel",
+        "recommendation": "Audit CAC, pricing, and product mix for {e}.",
+        "expected_impact": "Eliminates value-destructive growth.",
+        "risk_tradeoff": "Channel scale may reduce temporarily.",
+        "confidence": "HIGH",
+    },
+    "SPEND_SPIKE_WEAK_RETURN": {
+        "scope": "channel",
+        "field": "channel",
+        "recommendation": (
+            "Investigate recent spend increase on {e} for attribution leakage."
+        ),
+        "expected_impact": "Prevents inefficient scaling.",
+        "risk_tradeoff": "Delayed growth if spike was experimental.",
+        "confidence": "MEDIUM",
+    },
+
+    # --- PRODUCT PORTFOLIO ---
+    "PRODUCT_REVENUE_CONCENTRATION": {
+        "scope": "portfolio",
+        "field": None,
+        "recommendation": (
+            "Reduce dependency on top products via SKU expansion or demand diversification."
+        ),
+        "expected_impact": "Improves revenue resilience.",
+        "risk_tradeoff": "New products may dilute margins initially.",
+        "confidence": "MEDIUM",
+    },
+    "FAKE_GROWTH_PRODUCT": {
+        "scope": "product",
+        "field": "product",
+        "recommendation": "Reasses pricing or marketing support for {e}",
+        "expected_impact": "Prevents profit-negative growth.",
+        "risk_tradeoff": "Revenue contraction possible.",
+        "confidence": "HIGH",
+    },
+
+    # --- Inventory ---
+    "FREQUENT_STOCKOUTS": {
+        "scope": "{e}",
+        "field": "product",
+        "entity": False,
+        "recommendation": "Increase safety stock or reorder frequency for {e}.",
+        "expected_impact": "Recovers lost revenue.",
+        "risk_tradeoff": "Higher inventory holding costs.",
+        "confidence": "HIGH",
+    },
+    "STOCKOUT_REVENUE_IMPACT": {
+        "scope": "product",
+        "field": "product",
+        "recommendation": "Prioritize supply allocation to {e} during demand peaks.",
+        "expected_impact": "Reduces supply-constrained losses.",
+        "risk_tradeoff": "Lower priority SKUs may suffer.",
+        "confidence": "HIGH",
+    },
+    "LOW_STOCK_PRESSURE": {
+        "scope": "product",
+        "field": "product",
+        "recommendation": "Closely monitor demand volatility for {e}.",
+        "expected_impact": "Prevents future stockouts.",
+        "risk_tradeoff": "Forecast errors possible.",
+        "confidence": "MEDIUM",
+    },
+
+    # --- CHANNEL DEPENDENCY ---
+    "CHANNEL_REVENUE_CONCENTRATION": _DIVERSIFY_CHANNELS,
+    "SINGLE_CHANNEL_DEPENDENCY": _DIVERSIFY_CHANNELS,
+    "PROFIT_CONCENTRATION": _DIVERSIFY_CHANNELS,
+    "ROAS_ILLUSIONS": {
+        "scope": "channel",
+        "field": "channel",
+        "recommendation": "Validate true incremental lift from {e} spend.",
+        "expected_impact": "Prevents false confidence from blended ROAS.",
+        "risk_tradeoff": "Measurement complexity increases.",
+        "confidence": "MEDIUM",
+    },
+}
+
+def _flag_entities(g: pd.DataFrame, field: str | None) -> list:
+    # Missing keys come back from the DataFrame as NaN; recs want None
+    if field is None or field not in g:
+        return [None] * len(g)
+    col = g[field].astype(object)
+    return col.where(col.notna(), None).tolist()
+
 def generate_recommendations(
         flags: list,
         growth_signal: dict | None = None
@@ -967,159 +1168,45 @@ def generate_recommendations(
     executive-safe decision levers. 
     """
 
-    recs = []
-
-    for f in flags:
-        t = f["type"]
-
-        # --- MARKETING EFFICIENCY ---
-        if t == "LOW_ROAS":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "channel",
-                "entity": f.get("channel"),
-                "recommendation": (
-                    f"Reduce or pause spend on {f.get('channel')} until ROAS improves."
-                ),
-                "expected_impact": "Stops inefficient capital burn.",
-                "risk_tradeoff": "Short-term revenue decline possible.",
-                "confidence": "HIGH",
-            })
-
-        if t == "NEGATIVE_OR_LOW_NET_MARGIN":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "channel",
-                "entity": f.get("channel"),
-                "recommendation": (
-                    f"Audit CAC, pricing, and product mix for {f.get('channel')}."
-                ),
-                "expected_impact": "Eliminates value-destructive growth.",
-                "risk_tradeoff": "Channel scale may reduce temporarily.",
-                "confidence": "HIGH",
-            })
-        
-        if t == "SPEND_SPIKE_WEAK_RETURN":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "channel",
-                "entity": f.get("channel"),
-                "recommendation": (
-                    f"Investigate recent spend increase on {f.get('channel')} for attribution leakage."
-                ),
-                "expected_impact": "Prevents inefficient scaling.",
-                "risk_tradeoff": "Delayed growth if spike was experimental.",
-                "confidence": "MEDIUM",
-            })
-        
-        # --- PRODUCT PORTFOLIO ---
-        if t == "PRODUCT_REVENUE_CONCENTRATION":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "portfolio",
-                "entity": None,
-                "recommendation": (
-                    "Reduce dependency on top products via SKU expansion or demand diversification."
-                ),
-                "expected_impact": "Improves revenue resilience.",
-                "risk_tradeoff": "New products may dilute margins initially.",
-                "confidence": "MEDIUM",
-            })
-        
-        if t == "FAKE_GROWTH_PRODUCT":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "product",
-                "entity": f.get("product"),
-                "recommendation": (
-                    f"Reasses pricing or marketing support for {f.get('product')}"
-                ),
-                "expected_impact": "Prevents profit-negative growth.",
-                "risk_tradeoff": "Revenue contraction possible.",
-                "confidence": "HIGH",
-            })
-        
-        # --- Inventory ---
-        if t == "FREQUENT_STOCKOUTS":
-            recs.append({
-                "trigger_flag": t,
-                "scope": f.get("product"),
-                "recommendation": (
-                    f"Increase safety stock or reorder frequency for {f.get('product')}."
-                ),
-                "expected_impact": "Recovers lost revenue.",
-                "risk_tradeoff": "Higher inventory holding costs.",
-                "confidence": "HIGH",
-            })
-
-        if t == "STOCKOUT_REVENUE_IMPACT":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "product",
-                "entity": f.get("product"),
-                "recommendation": (
-                    f"Prioritize supply allocation to {f.get('product')} during demand peaks."
-                ),
-                "expected_impact": "Reduces supply-constrained losses.",
-                "risk_tradeoff": "Lower priority SKUs may suffer.",
-                "confidence": "HIGH",
-            })
-
-        if t == "LOW_STOCK_PRESSURE":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "product",
-                "entity": f.get("product"),
-                "recommendation": (
-                    f"Closely monitor demand volatility for {f.get('product')}."
-                ),
-                "expected_impact": "Prevents future stockouts.",
-                "risk_tradeoff": "Forecast errors possible.",
-                "confidence": "MEDIUM",
-            })
-        
-        # --- CHANNEL DEPENDENCY ---
-        if t in ["CHANNEL_REVENUE_CONCENTRATION", "SINGLE_CHANNEL_DEPENDENCY", "PROFIT_CONCENTRATION"]:
-            recs.append({
-                "trigger_flag": t,
-                "scope": "company",
-                "entity": None,
-                "recommendation": (
-                    "Diversify revenue sources across additional channels."
-                ),
-                "expected_impact": "Reduces single-point-of-failure risk.",
-                "risk_tradeoff": "New channels may be inefficient initially.",
-                "confidence": "MEDIUM",
-            })
-        
-        if t == "ROAS_ILLUSIONS":
-            recs.append({
-                "trigger_flag": t,
-                "scope": "channel",
-                "entity": f.get("channel"),
-                "recommendation": (
-                    f"Validate true incremental lift from {f.get('channel')} spend."
-                ),
-                "expected_impact": "Prevents false confidence from blended ROAS.",
-                "risk_tradeoff": "Measurement complexity increases.",
-                "confidence": "MEDIUM",
-            })
-        
-        # --- GROWTH QUALITY SIGNAL OVERLAY ---
-        if growth_signal:
-            signal = growth_signal.get("signal")
-
-            if signal == "NEGATIVE":
-                recs.append({
-                    "trigger_flag": "GROWTH_QUALITY_NEGATIVE",
-                    "scope": "company",
-                    "entity": None,
-                    "recommendation": (
-                        "Avoid aggressive scaling until unit economics stabilize."
-                    ),
-                    "expected_impact": "Prevents compounding losses.",
-                    "risk_tradeoff": "Growth slowdown.",
-                    "confidence": growth_signal.get("confidence", "MEDIUM"), 
-                })
+    # One pass per flag type over a DataFrame of all flags; each rec is written
+    # back to its flag's position so the output keeps the input order.
+    # A (trigger_flag, entity) pair is only recommended once.
+    slots = [None] * len(flags)
+    seen = set()
+
+    if flags:
+        fdf = pd.DataFrame(flags)
+        for t, g in fdf.groupby("type", sort=False):
+            tpl = TEMPLATES.get(t)
+            if tpl is None:
+                continue
+            for i, e in zip(g.index, _flag_entities(g, tpl["field"])):
+                if (t, e) in seen:
+                    continue
+                seen.add((t, e))
+                rec = {"trigger_flag": t, "scope": tpl["scope"].format(e=e)}
+                if tpl.get("entity", True):
+                    rec["entity"] = e
+                rec["recommendation"] = tpl["recommendation"].format(e=e)
+                rec["expected_impact"] = tpl["expected_impact"]
+                rec["risk_tradeoff"] = tpl["risk_tradeoff"]
+                rec["confidence"] = tpl["confidence"]
+                slots[i] = rec
+
+    recs = [r for r in slots if r is not None]
+
+    # --- GROWTH QUALITY SIGNAL OVERLAY (once, not per flag) ---
+    if growth_signal and growth_signal.get("signal") == "NEGATIVE":
+        recs.append({
+            "trigger_flag": "GROWTH_QUALITY_NEGATIVE",
+            "scope": "company",
+            "entity": None,
+            "recommendation": (
+                "Avoid aggressive scaling until unit economics stabilize."
+            ),
+            "expected_impact": "Prevents compounding losses.",
+            "risk_tradeoff": "Growth slowdown.",
+            "confidence": growth_signal.get("confidence", "MEDIUM"), 
+        })
         
     return recs
\ No newline at end of file
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# ------------------------------------------------------
+# Exact-match response cache for chat completions
+# ------------------------------------------------------
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """SHA-256 over the canonical JSON of the request payload."""
+    blob = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed key -> response dict store.
+    Entries expire `ttl` seconds after they were written; the oldest rows are
+    evicted once the table grows past `max_entries`. Reads never write.
+    The database is opened on first use. Calls block on disk I/O, so async
+    callers run them in a worker thread.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl: int = CACHE_TTL_SECONDS,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Caller holds self._lock
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        value, created_at = row
+        if time.time() - created_at > self.ttl:
+            return None  # pruned by the next set()
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now, now),
+            )
+            # Expired rows, then everything older than the newest max_entries
+            # (both are range deletes on the created_at index)
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ("
+                " SELECT created_at FROM responses ORDER BY created_at DESC LIMIT 1 OFFSET ?)",
+                (self.max_entries - 1,),
+            )
+            conn.commit()
+
+
+# ------------------------------------------------------
+# Semantic cache for first-turn tool plans
+# ------------------------------------------------------
+
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+
+class SemanticPlanCache:
+    """
+    Maps an embedded user question -> the tool_calls the model planned for it.
+    Lookup is a cosine-similarity scan over the stored (unit-normalized)
+    embeddings; only side-effect-free tool plans are ever stored.
+    """
+
+    def __init__(self, path=CACHE_PATH, threshold: float = SEMANTIC_THRESHOLD,
+                 ttl: int = CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " embedding BLOB NOT NULL,"
+            " tool_calls TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "DELETE FROM plans WHERE created_at < ?", (time.time() - ttl,)
+        )
+        self._conn.commit()
+
+        rows = self._conn.execute(
+            "SELECT embedding, tool_calls, created_at FROM plans"
+        ).fetchall()
+        self._vectors = [np.frombuffer(r[0], dtype=np.float32) for r in rows]
+        self._plans = [json.loads(r[1]) for r in rows]
+        self._created = [r[2] for r in rows]
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def get(self, embedding) -> Optional[List[Dict[str, Any]]]:
+        if not self._vectors:
+            return None
+
+        query = self._normalize(embedding)
+        with self._lock:
+            scores = np.vstack(self._vectors) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            if time.time() - self._created[best] > self.ttl:
+                return None
+            return self._plans[best]
+
+    def set(self, embedding, tool_calls: List[Dict[str, Any]]):
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO plans VALUES (?, ?, ?)",
+                (vector.tobytes(), json.dumps(tool_calls), now),
+            )
+            self._conn.commit()
+            self._vectors.append(vector)
+            self._plans.append(tool_calls)
+            self._created.append(now)
@@ -1,81 +1,139 @@
 # tools.py
+import copy
+import functools
 from typing import Dict, Any
 import pandas as pd
 
-from .analytics import *
+from .analytics import (
+    load_context,
+    daily_delta,
+    revenue_recent_performance,
+    top_products,
+    top_regions,
+    sales_by_product,
+    sales_by_region,
+    sales_by_channel,
+    revenue_by_month,
+    profit_by_product,
+    true_profit_by_channel,
+    cost_components_by_product,
+    interpret_growth_quality,
+    marketing_efficiency,
+    product_portfolio_health,
+    inventory_health_vs_revenue,
+    channel_dependency_risk,
+    generate_recommendations,
+)
+
+# Load ONCE, on the first tool call rather than at import
+@functools.lru_cache(maxsize=1)
+def _ctx():
+    return load_context()
+
+
+def _memoized(fn):
+    """
+    The context never changes for the process lifetime, so each tool result is computed
+    once per argument set. Callers get a deep copy so mutating a returned dict /
+    DataFrame can't poison the cached value.
+    """
+    cached = functools.lru_cache(maxsize=None)(fn)
 
-# Load ONCE
-CTX = load_context()
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return copy.deepcopy(cached(*args, **kwargs))
+
+    wrapper.cache_clear = cached.cache_clear
+    # Uncopied shared result, for internal callers that only read it
+    wrapper.cached = cached
+    return wrapper
 
 
 # ----------------------
 # EXECUTIVE TOOLS
 # ----------------------
 
+@_memoized
 def tool_daily_delta() -> Dict[str, Any]:
-    return daily_delta(CTX)
+    return daily_delta(_ctx())
 
+@_memoized
 def tool_revenue_recent_performance(n: int = 7) -> Dict[str, Any]:
-    return revenue_recent_performance(CTX, n=n)
+    return revenue_recent_performance(_ctx(), n=n)
 
+@_memoized
 def tool_top_products(n: int = 3):
-    return top_products(CTX, n=n).to_dict("records")
+    return top_products(_ctx(), n=n).to_dict("records")
 
+@_memoized
 def tool_top_regions(n: int = 3):
-    return top_regions(CTX, n=n).to_dict("records")
+    return top_regions(_ctx(), n=n).to_dict("records")
 
+@_memoized
 def tool_true_profit_by_channel():
-    return true_profit_by_channel(CTX).to_dict("records")
+    return true_profit_by_channel(_ctx()).to_dict("records")
 
 
 # ----------------------
 # ANALYTICS TOOLS
 # ----------------------
 
+@_memoized
 def tool_sales_by_product():
-    return sales_by_product(CTX).to_dict("records")
+    return sales_by_product(_ctx()).to_dict("records")
 
+@_memoized
 def tool_sales_by_region():
-    return sales_by_region(CTX).to_dict("records")
+    return sales_by_region(_ctx()).to_dict("records")
 
+@_memoized
 def tool_sales_by_channel():
-    return sales_by_channel(CTX).to_dict("records")
+    return sales_by_channel(_ctx()).to_dict("records")
 
+@_memoized
 def tool_revenue_by_month():
-    return revenue_by_month(CTX).to_dict("records")
+    return revenue_by_month(_ctx()).to_dict("records")
 
+@_memoized
 def tool_profit_by_product():
-    return profit_by_product(CTX).to_dict("records")
+    return profit_by_product(_ctx()).to_dict("records")
 
+@_memoized
 def tool_cost_components_by_product():
-    return cost_components_by_product(CTX).to_dict("records")
+    return cost_components_by_product(_ctx()).to_dict("records")
 
 
 # ----------------------
 # INTERPRETATION TOOLS (THE MAGIC)
 # ----------------------
 
+@_memoized
 def tool_interpret_growth_quality():
-    recent = revenue_recent_performance(CTX, n=7)
-    prof = profit_by_product(CTX)
+    recent = revenue_recent_performance(_ctx(), n=7)
+    prof = profit_by_product(_ctx())
     return interpret_growth_quality(recent, prof)
 
+@_memoized
 def tool_marketing_efficiency(lookback_days: int = 30):
-    return marketing_efficiency(CTX,lookback_days=lookback_days)
+    return marketing_efficiency(_ctx(),lookback_days=lookback_days)
 
+@_memoized
 def tool_product_portfolio_health():
-    return product_portfolio_health(CTX)
+    return product_portfolio_health(_ctx())
 
+@_memoized
 def tool_inventory_health_vs_revenue(lookback_days: int = 30):
-    return inventory_health_vs_revenue(CTX, lookback_days=lookback_days)
+    return inventory_health_vs_revenue(_ctx(), lookback_days=lookback_days)
 
+@_memoized
 def tool_channel_dependency_risk():
-    return channel_dependency_risk(CTX)
+    return channel_dependency_risk(_ctx())
 
 # ----------------------
 # RECOMMENDATION TOOL
 # ----------------------
 
+@_memoized
 def tool_generate_recommendations():
     """
     Central executive recommendation primitive.
@@ -84,20 +142,18 @@ def tool_generate_recommendations():
 
     flags = []
 
-    # Collect flags from all interpretation primitives
-    me = marketing_efficiency(CTX)
-    pp = product_portfolio_health(CTX)
-    inv = inventory_health_vs_revenue(CTX)
-    ch = channel_dependency_risk(CTX)
+    # Collect flags from all interpretation primitives. Read the shared memoized
+    # results directly: they are only read here, so the per-call deepcopy is waste
+    me = tool_marketing_efficiency.cached()
+    pp = tool_product_portfolio_health.cached()
+    inv = tool_inventory_health_vs_revenue.cached()
+    ch = tool_channel_dependency_risk.cached()
 
     for block in [me, pp, inv, ch]:
         flags.extend(block.get("flags", []))
 
     # Growth quality is signal-based, not flag-based
-    growth_signal = interpret_growth_quality(
-        revenue_recent_performance(CTX, n=7),
-        profit_by_product(CTX)
-    )
+    growth_signal = tool_interpret_growth_quality.cached()
 
     return generate_recommendations(
         flags=flags,
@@ -1,6 +1,7 @@
+import importlib.util
+
 import pandas as pd
 import numpy as np
-import random
 from datetime import datetime, timedelta
 
 # ---------- CONFIG ----------
@@ -13,120 +14,121 @@ start_date = datetime(2024, 1, 1)
 end_date = datetime(2024, 12, 31)
 dates = pd.date_range(start=start_date, end=end_date, freq="D")
 
+# One seeded generator for the whole script, so reruns reproduce the same data
+rng = np.random.default_rng(42)
+
 # ---------- 1. SALES DATA ----------
-sales_rows = []
-
-for date in dates:
-    for product in products:
-        for region in regions:
-            channel = random.choice(channels)
-
-            # realistic units_sold patterns
-            base = {
-                "Nutrain Vanilla": 40,
-                "Nutrain Choco Coffee": 30,
-                "Nutrain Banana Oats": 15
-            }[product]
-
-            # region boost
-            region_factor = {
-                "Bangalore": 1.4,
-                "Mumbai": 1.2,
-                "Delhi": 1.0,
-                "Chennai": 0.9
-            }[region]
-
-            # seasonal variation
-            season = 1.2 if date.month in [1,2,6,7] else 1.0
-
-            units = int(np.random.normal(base * region_factor * season, 5))
-            units = max(units, 0)
-
-            revenue = units * random.choice([99, 109, 119])  # typical RTD price
-            CAC = random.uniform(20, 80)  # cost to acquire customer
-
-            sales_rows.append([
-                date.strftime("%Y-%m-%d"),
-                product,
-                region,
-                channel,
-                units,
-                revenue,
-                round(CAC, 2)
-            ])
-
-sales_df = pd.DataFrame(sales_rows, columns=[
-    "date", "product", "region", "channel", "units_sold", "revenue", "CAC"
-])
+# realistic units_sold patterns
+base_demand = {
+    "Nutrain Vanilla": 40,
+    "Nutrain Choco Coffee": 30,
+    "Nutrain Banana Oats": 15
+}
+
+# region boost
+region_factor = {
+    "Bangalore": 1.4,
+    "Mumbai": 1.2,
+    "Delhi": 1.0,
+    "Chennai": 0.9
+}
+
+# One row per (date, product, region); every column drawn in a single batch
+idx = pd.MultiIndex.from_product([dates, products, regions], names=["date", "product", "region"])
+n_rows = len(idx)
+row_dates = idx.get_level_values("date")
+
+# Factor arrays aligned with products / regions, gathered by category code
+base_arr = np.array([base_demand[p] for p in products], dtype=float)
+region_arr = np.array([region_factor[r] for r in regions], dtype=float)
+
+product_codes = pd.Categorical(idx.get_level_values("product"), categories=products).codes
+region_codes = pd.Categorical(idx.get_level_values("region"), categories=regions).codes
+
+base = base_arr[product_codes]
+rf = region_arr[region_codes]
+
+# seasonal variation: one value per day, repeated over the date-major product x region rows
+season_daily = np.where(dates.month.isin([1, 2, 6, 7]), 1.2, 1.0)
+season = np.repeat(season_daily, len(products) * len(regions))
+
+units = np.maximum(rng.normal(base * rf * season, 5).astype(int), 0)
+revenue = units * rng.choice([99, 109, 119], size=n_rows)  # typical RTD price
+CAC = rng.uniform(20, 80, size=n_rows).round(2)  # cost to acquire customer
+
+sales_df = pd.DataFrame({
+    "date": row_dates.strftime("%Y-%m-%d"),
+    "product": pd.Categorical.from_codes(product_codes, categories=products),
+    "region": pd.Categorical.from_codes(region_codes, categories=regions),
+    "channel": pd.Categorical(rng.choice(channels, size=n_rows), categories=channels),
+    "units_sold": units,
+    "revenue": revenue,
+    "CAC": CAC,
+})
 
 
 # ---------- 2. CUSTOMER DATA ----------
-customer_rows = []
-customer_id = 1000
-
-for i in range(1200):  # approx customers
-    customer_id += 1
-    signup = start_date + timedelta(days=random.randint(0, 364))
-    region = random.choice(regions)
-    subscription = random.choice(["Yes", "No"])
-
-    # realistic LTV
-    if subscription == "Yes":
-        LTV = random.uniform(1500, 6000)
-        churned = "No"
-    else:
-        LTV = random.uniform(300, 1200)
-        churned = random.choice(["Yes", "No"])
-
-    customer_rows.append([
-        customer_id,
-        signup.strftime("%Y-%m-%d"),
-        region,
-        subscription,
-        round(LTV, 2),
-        churned
-    ])
-
-customers_df = pd.DataFrame(customer_rows, columns=[
-    "customer_id", "signup_date", "region", "subscription", "LTV", "churned"
-])
+n_customers = 1200  # approx customers
+
+signup = start_date + pd.to_timedelta(rng.integers(0, 365, size=n_customers), unit="D")
+subscription = rng.choice(["Yes", "No"], size=n_customers)
+subscribed = subscription == "Yes"
+
+# realistic LTV; subscribers never churn
+LTV = np.where(
+    subscribed,
+    rng.uniform(1500, 6000, size=n_customers),
+    rng.uniform(300, 1200, size=n_customers),
+)
+churned = np.where(subscribed, "No", rng.choice(["Yes", "No"], size=n_customers))
+
+customers_df = pd.DataFrame({
+    "customer_id": np.arange(1001, 1001 + n_customers),
+    "signup_date": signup.strftime("%Y-%m-%d"),
+    "region": pd.Categorical(rng.choice(regions, size=n_customers), categories=regions),
+    "subscription": pd.Categorical(subscription, categories=["Yes", "No"]),
+    "LTV": LTV.round(2),
+    "churned": pd.Categorical(churned, categories=["Yes", "No"]),
+})
 
 
 # ---------- 3. MARKETING DATA ----------
-marketing_rows = []
-
-for date in dates:
-    for channel in marketing_channels:
-
-        if channel == "Instagram":
-            spend = random.uniform(3000, 9000)
-            impressions = random.randint(20000, 80000)
-            clicks = int(impressions * random.uniform(0.01, 0.03))
-        elif channel == "Google":
-            spend = random.uniform(5000, 15000)
-            impressions = random.randint(15000, 50000)
-            clicks = int(impressions * random.uniform(0.015, 0.04))
-        else:  # influencers
-            spend = random.uniform(2000, 15000)
-            impressions = random.randint(10000, 70000)
-            clicks = int(impressions * random.uniform(0.005, 0.02))
-
-        conversions = int(clicks * random.uniform(0.02, 0.08))
-        revenue = conversions * random.uniform(99, 119)
-
-        marketing_rows.append([
-            date.strftime("%Y-%m-%d"),
-            channel,
-            round(spend, 2),
-            impressions,
-            clicks,
-            conversions,
-            round(revenue, 2)
-        ])
-
-marketing_df = pd.DataFrame(marketing_rows, columns=[
-    "date", "channel", "spend", "impressions", "clicks", "conversions", "revenue"
-])
+# Per-channel distributions: spend range, impressions range (inclusive), CTR range
+MARKETING_PARAMS = {
+    "Instagram": {"spend": (3000, 9000), "imp": (20000, 80000), "ctr": (0.01, 0.03)},
+    "Google": {"spend": (5000, 15000), "imp": (15000, 50000), "ctr": (0.015, 0.04)},
+    "Influencers": {"spend": (2000, 15000), "imp": (10000, 70000), "ctr": (0.005, 0.02)},
+}
+
+# One vectorized block per channel (a full year of days at once)
+n_days = len(dates)
+date_strs = dates.strftime("%Y-%m-%d")
+marketing_blocks = []
+
+for code, channel in enumerate(marketing_channels):
+    P = MARKETING_PARAMS[channel]
+
+    spend = rng.uniform(*P["spend"], size=n_days)
+    impressions = rng.integers(P["imp"][0], P["imp"][1] + 1, size=n_days)
+    clicks = (impressions * rng.uniform(*P["ctr"], size=n_days)).astype(int)
+    conversions = (clicks * rng.uniform(0.02, 0.08, size=n_days)).astype(int)
+    revenue = conversions * rng.uniform(99, 119, size=n_days)
+
+    marketing_blocks.append(pd.DataFrame({
+        "date": date_strs,
+        "channel": pd.Categorical.from_codes(np.full(n_days, code), categories=marketing_channels),
+        "spend": spend.round(2),
+        "impressions": impressions,
+        "clicks": clicks,
+        "conversions": conversions,
+        "revenue": revenue.round(2),
+    }))
+
+# Back to date-major row order (channels in marketing_channels order within a day)
+marketing_df = (
+    pd.concat(marketing_blocks, ignore_index=True)
+      .sort_values("date", kind="stable", ignore_index=True)
+)
 
 
 # ---------- 4. COMPETITOR DATA ----------
@@ -140,31 +142,46 @@ updates = [
     "Introduced subscription discounts",
 ]
 
-competitor_rows = []
+n_comp = len(competitors)
 
-for comp in competitors:
-    price = random.choice([99, 129, 149])
-    protein = random.choice([20, 22, 25])
-    calories = random.choice([150, 180, 200])
-    highlight = random.choice([
+competitors_df = pd.DataFrame({
+    "competitor": competitors,
+    "price": rng.choice([99, 129, 149], size=n_comp),
+    "protein": rng.choice([20, 22, 25], size=n_comp),
+    "calories": rng.choice([150, 180, 200], size=n_comp),
+    "highlight": rng.choice([
         "High protein, low sugar",
         "Best for office workers",
         "Vegan-friendly",
         "Budget fitness drink"
-    ])
-    update = random.choice(updates)
-
-    competitor_rows.append([comp, price, protein, calories, highlight, update])
-
-competitors_df = pd.DataFrame(competitor_rows, columns=[
-    "competitor", "price", "protein", "calories", "highlight", "update"
-])
-
-
-# ---------- SAVE CSV ----------
-sales_df.to_csv("data/sales.csv", index=False)
-customers_df.to_csv("data/customers.csv", index=False)
-marketing_df.to_csv("data/marketing.csv", index=False)
-competitors_df.to_csv("data/competitors.csv", index=False)
+    ], size=n_comp),
+    "update": rng.choice(updates, size=n_comp),
+})
+
+
+# ---------- SAVE ----------
+# Parquet copies need pyarrow; without it only the CSVs are written
+WRITE_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+def save(df, name, dates=()):
+    """
+    CSV stays the interchange format (the daily simulators append to it).
+    The Parquet copy keeps real dtypes (the frames are built with categorical
+    string columns, written dictionary-encoded), so load_context can skip CSV
+    parsing while it is the fresher of the two.
+    """
+    df.to_csv(f"data/{name}.csv", index=False)
+    if not WRITE_PARQUET:
+        return
+
+    typed = df.copy()
+    for col in dates:
+        typed[col] = pd.to_datetime(typed[col])
+    typed.to_parquet(f"data/{name}.parquet", compression="zstd", index=False)
+
+save(sales_df, "sales", dates=["date"])
+save(customers_df, "customers", dates=["signup_date"])
+save(marketing_df, "marketing", dates=["date"])
+save(competitors_df, "competitors")
 
 print("✔ Fake Nutrain data generated successfully!")
@@ -1,7 +1,8 @@
+import importlib.util
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import random
 
 # -------------------------
 # BASE CONFIG
@@ -17,6 +18,9 @@ channels = ["Instagram", "Google", "Influencers"]
 
 customer_segments = ["Student", "Working Professional", "Gym-goer"]
 
+# One seeded generator for the whole script, so reruns reproduce the same data
+rng = np.random.default_rng(42)
+
 start_date = datetime(2024, 1, 1)
 dates = [start_date + timedelta(days=i) for i in range(365)]
 
@@ -116,37 +120,32 @@ dates = [start_date + timedelta(days=i) for i in range(365)]
 # ✅ ACTIVE: CUSTOMER SEGMENTS DATA (LOGIC FIXED)
 # =====================================================
 
-segment_rows = []
+n_customers = 1200
 
-for i in range(1200):
-    customer_id = f"C{i+1000}"
-    segment = random.choice(customer_segments)
-    age_group = random.choice(["18–24", "25–34", "35–44"])
+age_groups = ["18–24", "25–34", "35–44"]
 
-    # ✅ LOGICAL RULE:
-    # If segment is Gym-goer, gym_member MUST be Yes
-    if segment == "Gym-goer":
-        gym_member = "Yes"
-    else:
-        gym_member = random.choice(["Yes", "No"])
+segment = rng.choice(customer_segments, size=n_customers)
+age_group = rng.choice(age_groups, size=n_customers)
 
-    monthly_spend = random.randint(499, 3499)
+# ✅ LOGICAL RULE:
+# If segment is Gym-goer, gym_member MUST be Yes
+gym_member = np.where(segment == "Gym-goer", "Yes", rng.choice(["Yes", "No"], size=n_customers))
 
-    segment_rows.append([
-        customer_id,
-        segment,
-        age_group,
-        gym_member,
-        monthly_spend
-    ])
+monthly_spend = rng.integers(499, 3500, size=n_customers)
 
-segment_df = pd.DataFrame(segment_rows, columns=[
-    "customer_id", "segment",
-    "age_group", "gym_member",
-    "monthly_spend"
-])
+segment_df = pd.DataFrame({
+    "customer_id": [f"C{i+1000}" for i in range(n_customers)],
+    "segment": pd.Categorical(segment, categories=customer_segments),
+    "age_group": pd.Categorical(age_group, categories=age_groups),
+    "gym_member": pd.Categorical(gym_member, categories=["Yes", "No"]),
+    "monthly_spend": monthly_spend,
+})
 
 segment_df.to_csv("data/customer_segments.csv", index=False)
 
+# Typed Parquet copy (dictionary-encoded categoricals) for fast reloads; needs pyarrow
+if importlib.util.find_spec("pyarrow") is not None:
+    segment_df.to_parquet("data/customer_segments.parquet", compression="zstd", index=False)
+
 print("✅ Customer сегments data regenerated with correct logic.")
 
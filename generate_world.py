@@ -1,8 +1,12 @@
+import importlib.util
+import json
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from agent.analytics import read_table
+
 # =========================
 # CONFIG (WORLD RULES)
 # =========================
@@ -45,6 +49,13 @@ CHANNEL_BEHAVIOR = {
     "Influencers": {"ctr": (0.004, 0.012), "cvr": (0.010, 0.025), "cpc": (6.0, 18.0)},
 }
 
+# Spend as a share of attributed revenue (Google tends to burn more)
+CHANNEL_INEFFICIENCY = {
+    "Instagram": (0.18, 0.28),
+    "Google": (0.30, 0.55),
+    "Influencers": (0.28, 0.60),
+}
+
 # Inventory rules
 STARTING_STOCK = 150  # per product
 PRODUCTION_RANGE = {
@@ -56,142 +67,143 @@ PRODUCTION_RANGE = {
 # Noise range (stable)
 DEMAND_NOISE = (0.85, 1.15)
 START_DATE = None
+
+# Per-product arrays aligned with PRODUCTS (built once, used by the vectorized day)
+BASE_ARR = np.array([BASE_DAILY_DEMAND[p] for p in PRODUCTS], dtype=float)
+PROD_LO = np.array([PRODUCTION_RANGE[p][0] for p in PRODUCTS], dtype=np.int64)
+PROD_HI = np.array([PRODUCTION_RANGE[p][1] for p in PRODUCTS], dtype=np.int64)
+PRICE_ARR = np.array([UNIT_ECON[p]["selling_price"] for p in PRODUCTS], dtype=np.int64)
+
+# Joint region x channel split (region-major), normalized once
+RC_W = np.outer(
+    [REGION_W[r] for r in REGIONS],
+    [CHANNEL_W[c] for c in CHANNELS],
+).ravel()
+RC_W = RC_W / RC_W.sum()
+
+# Daily sales cell layout (product-major, then region, then channel) as codes
+N_CELLS = len(PRODUCTS) * len(REGIONS) * len(CHANNELS)
+CELL_PRODUCT = np.repeat(np.arange(len(PRODUCTS)), len(REGIONS) * len(CHANNELS))
+CELL_REGION = np.tile(np.repeat(np.arange(len(REGIONS)), len(CHANNELS)), len(PRODUCTS))
+CELL_CHANNEL = np.tile(np.arange(len(CHANNELS)), len(PRODUCTS) * len(REGIONS))
+CELL_PRICE = PRICE_ARR[CELL_PRODUCT]
+
+# Marketing ranges as (lo, hi) arrays aligned with CHANNELS
+INEFF_LO, INEFF_HI = np.array([CHANNEL_INEFFICIENCY[c] for c in CHANNELS]).T
+CTR_LO, CTR_HI = np.array([CHANNEL_BEHAVIOR[c]["ctr"] for c in CHANNELS]).T
+CVR_LO, CVR_HI = np.array([CHANNEL_BEHAVIOR[c]["cvr"] for c in CHANNELS]).T
+CPC_LO, CPC_HI = np.array([CHANNEL_BEHAVIOR[c]["cpc"] for c in CHANNELS]).T
 # =========================
 # HELPERS
 # =========================
 
-def _safe_int(x: float) -> int:
-    return int(max(0, round(x)))
+def _simulate_days(dates: list, stock_state: dict, rng: np.random.Generator):
+    """
+    Simulates consecutive days as one batch of (day, ...) arrays; the stock
+    carry-over is the only step that runs day by day.
+    Returns:
+      sales_cols, marketing_cols, inventory_cols, updated_stock_state
+    """
+
+    n_days, n_products, n_channels = len(dates), len(PRODUCTS), len(CHANNELS)
+    shape = (n_days, n_products)
+    date_strs = np.array([d.strftime("%Y-%m-%d") for d in dates])
+
+    # 1) Demand (independent of stock, so drawn for every day at once)
+    noise = rng.uniform(*DEMAND_NOISE, size=shape)
+    demand = np.maximum(0, np.round(BASE_ARR * noise)).astype(np.int64)
+
+    # 2) Inventory: produce first, then cap sales by what is on hand
+    produced = rng.integers(PROD_LO, PROD_HI + 1, size=shape)
+    shortfall = rng.random(shape) < 0.12  # 12% of days
+    produced = np.where(
+        shortfall,
+        (produced * rng.uniform(0.2, 0.5, size=shape)).astype(np.int64),
+        produced,
+    )
+
+    opening = np.empty(shape, dtype=np.int64)
+    stock = np.array([stock_state.get(p, STARTING_STOCK) for p in PRODUCTS], dtype=np.int64)
+    for d in range(n_days):
+        opening[d] = stock
+        stock = np.maximum(stock + produced[d] - demand[d], 0)
+
+    available = opening + produced
+    actual_sold = np.minimum(demand, available)
+    lost_demand = np.maximum(0, demand - available)
+    closing = available - actual_sold
+
+    # update state
+    stock_state.update(zip(PRODUCTS, stock.tolist()))
+
+    # 3) Sales allocation: one multinomial over the joint region x channel split
+    # (same distribution as region-then-channel); n broadcasts across days x products
+    units = rng.multinomial(actual_sold, RC_W).reshape(n_days, N_CELLS)  # cells in CELL_* order
+    revenue = units * CELL_PRICE
+
+    # 4) Marketing (all channels at once) — revenue attributed from sales by channel
+    channel_keys = np.arange(n_days)[:, None] * n_channels + CELL_CHANNEL
+    revenue_by_channel = np.bincount(
+        channel_keys.ravel(), weights=revenue.ravel(), minlength=n_days * n_channels
+    ).reshape(n_days, n_channels)
+
+    # spend derived from desired ROAS-ish behavior (but noisy):
+    # proportional to revenue capture, with channel inefficiency baked in
+    mk_shape = (n_days, n_channels)
+    spend = np.maximum(0.0, np.round(revenue_by_channel * rng.uniform(INEFF_LO, INEFF_HI, size=mk_shape), 2))
+
+    ctr = rng.uniform(CTR_LO, CTR_HI, size=mk_shape)
+    cvr = rng.uniform(CVR_LO, CVR_HI, size=mk_shape)
+    cpc = rng.uniform(CPC_LO, CPC_HI, size=mk_shape)
+
+    clicks = np.where(spend > 0, np.round(spend / cpc), 0).astype(np.int64)
+    impressions = np.round(clicks / ctr).astype(np.int64)
+    conversions = np.round(clicks * cvr).astype(np.int64)
+
+    # 5) CAC injection into sales rows (per channel-day CAC, gathered by channel code)
+    cac = np.where(conversions > 0, spend / np.maximum(conversions, 1), np.nan)
+
+    sales = {
+        "date": np.repeat(date_strs, N_CELLS),
+        "product": pd.Categorical.from_codes(np.tile(CELL_PRODUCT, n_days), categories=PRODUCTS),
+        "region": pd.Categorical.from_codes(np.tile(CELL_REGION, n_days), categories=REGIONS),
+        "channel": pd.Categorical.from_codes(np.tile(CELL_CHANNEL, n_days), categories=CHANNELS),
+        "units_sold": units.ravel(),
+        "revenue": revenue.ravel(),
+        "CAC": cac[:, CELL_CHANNEL].ravel(),
+    }
+
+    marketing = {
+        "date": np.repeat(date_strs, n_channels),
+        "channel": pd.Categorical.from_codes(np.tile(np.arange(n_channels), n_days), categories=CHANNELS),
+        "spend": spend.ravel(),
+        "impressions": impressions.ravel(),
+        "clicks": clicks.ravel(),
+        "conversions": conversions.ravel(),
+        "revenue": revenue_by_channel.ravel(),
+    }
+
+    inventory = {
+        "date": np.repeat(date_strs, n_products),
+        "product": pd.Categorical.from_codes(np.tile(np.arange(n_products), n_days), categories=PRODUCTS),
+        "opening_stock": opening.ravel(),
+        "units_produced": produced.ravel(),
+        "units_dispatched": actual_sold.ravel(),
+        "closing_stock": closing.ravel(),
+        "lost_demand": lost_demand.ravel(),
+        "stockout_flag": np.where(closing <= 0, "Yes", "No").ravel(),
+    }
+
+    return sales, marketing, inventory, stock_state
 
-def _alloc(total: int, weights: dict, rng: np.random.Generator) -> dict:
-    """Integer allocation of total across keys by weights."""
-    keys = list(weights.keys())
-    w = np.array([weights[k] for k in keys], dtype=float)
-    w = w / w.sum()
-    raw = rng.multinomial(total, w)
-    return {k: int(v) for k, v in zip(keys, raw)}
 
 def simulate_day(date: datetime, stock_state: dict, rng: np.random.Generator):
     """
     Returns:
       sales_day_df, marketing_day_df, inventory_day_df, updated_stock_state
     """
-
-    # 1) Demand (per product)
-    product_demand = {}
-    for p in PRODUCTS:
-        noise = rng.uniform(*DEMAND_NOISE)
-        product_demand[p] = _safe_int(BASE_DAILY_DEMAND[p] * noise)
-
-    # 2) Inventory: produce first
-    inventory_rows = []
-    produced_today = {}
-    for p in PRODUCTS:
-        opening = stock_state.get(p, STARTING_STOCK)
-        prod_lo, prod_hi = PRODUCTION_RANGE[p]
-        produced = int(rng.integers(prod_lo, prod_hi + 1))
-        if rng.random() < 0.12:  # 12% of days
-            produced = int(produced * rng.uniform(0.2, 0.5))
-
-        produced_today[p] = produced
-
-        inventory_rows.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "product": p,
-            "opening_stock": opening,
-            "units_produced": produced,
-            "units_dispatched": 0,   # fill after sales
-            "closing_stock": opening + produced,  # temp, update later
-            "lost_demand": 0,
-            "stockout_flag": "No",
-        })
-
-    inventory_df = pd.DataFrame(inventory_rows)
-
-    # 3) Sales allocation by region+channel, capped by inventory
-    sales_rows = []
-    for p in PRODUCTS:
-        available = int(inventory_df.loc[inventory_df["product"] == p, "closing_stock"].iloc[0])
-        demand = product_demand[p]
-        actual_sold = min(demand, available)
-        lost_demand = max(0, demand - available)
-
-        # allocate across regions then channels
-        region_alloc = _alloc(actual_sold, REGION_W, rng)
-        for r, units_r in region_alloc.items():
-            channel_alloc = _alloc(units_r, CHANNEL_W, rng)
-            for c, units in channel_alloc.items():
-                price = UNIT_ECON[p]["selling_price"]
-                revenue = units * price
-                sales_rows.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "product": p,
-                    "region": r,
-                    "channel": c,
-                    "units_sold": units,
-                    "revenue": revenue,
-                    "CAC": None,  # fill after marketing computes CAC per channel
-                })
-
-        # update inventory dispatched + closing
-        idx = inventory_df.index[inventory_df["product"] == p][0]
-        inventory_df.at[idx, "units_dispatched"] = actual_sold
-        closing = int(inventory_df.at[idx, "opening_stock"] + inventory_df.at[idx, "units_produced"] - actual_sold)
-        inventory_df.at[idx, "closing_stock"] = closing
-        inventory_df.at[idx, "lost_demand"] = lost_demand
-        inventory_df.at[idx, "stockout_flag"] = "Yes" if closing <= 0 else "No"
-
-        # update state
-        stock_state[p] = closing
-
-    sales_df = pd.DataFrame(sales_rows)
-
-    # 4) Marketing (per channel) — revenue attributed from sales by channel
-    marketing_rows = []
-    revenue_by_channel = sales_df.groupby("channel")["revenue"].sum().to_dict()
-
-    for c in CHANNELS:
-        channel_rev = float(revenue_by_channel.get(c, 0.0))
-
-        # spend derived from desired ROAS-ish behavior (but noisy)
-        # Spend proportional to revenue capture, with channel inefficiency baked in
-        # Google tends to burn more.
-        ineff = {"Instagram": (0.18, 0.28), "Google": (0.30, 0.55), "Influencers": (0.28, 0.60)}[c]
-        spend = channel_rev * rng.uniform(*ineff)
-        spend = float(max(0.0, round(spend, 2)))
-
-        beh = CHANNEL_BEHAVIOR[c]
-        ctr = rng.uniform(*beh["ctr"])
-        cvr = rng.uniform(*beh["cvr"])
-        cpc = rng.uniform(*beh["cpc"])
-
-        clicks = _safe_int(spend / cpc) if spend > 0 else 0
-        impressions = _safe_int(clicks / ctr) if ctr > 0 else 0
-        conversions = _safe_int(clicks * cvr)
-
-        marketing_rows.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "channel": c,
-            "spend": spend,
-            "impressions": impressions,
-            "clicks": clicks,
-            "conversions": conversions,
-            "revenue": channel_rev,
-        })
-
-    marketing_df = pd.DataFrame(marketing_rows)
-
-    # 5) CAC injection into sales rows (per channel-day CAC)
-    cac_by_channel = {}
-    for _, row in marketing_df.iterrows():
-        conv = float(row["conversions"])
-        spend = float(row["spend"])
-        cac = (spend / conv) if conv > 0 else None
-        cac_by_channel[row["channel"]] = cac
-
-    sales_df["CAC"] = sales_df["channel"].map(cac_by_channel)
-
-    return sales_df, marketing_df, inventory_df, stock_state
+    s, m, i, stock_state = _simulate_days([date], stock_state, rng)
+    return pd.DataFrame(s), pd.DataFrame(m), pd.DataFrame(i), stock_state
 
 
 def generate_range(start_date: str, end_date: str, seed: int = 42):
@@ -203,25 +215,23 @@ def generate_range(start_date: str, end_date: str, seed: int = 42):
     end = datetime.strptime(end_date, "%Y-%m-%d")
 
     stock_state = {p: STARTING_STOCK for p in PRODUCTS}
+    dates = [start + timedelta(days=k) for k in range((end - start).days + 1)]
+
+    s, m, i, _ = _simulate_days(dates, stock_state, rng)
+    return pd.DataFrame(s), pd.DataFrame(m), pd.DataFrame(i)
 
-    all_sales = []
-    all_marketing = []
-    all_inventory = []
-
-    cur = start
-    while cur <= end:
-        s, m, i, stock_state = simulate_day(cur, stock_state, rng)
-        all_sales.append(s)
-        all_marketing.append(m)
-        all_inventory.append(i)
-        cur += timedelta(days=1)
-
-    return (
-        pd.concat(all_sales, ignore_index=True),
-        pd.concat(all_marketing, ignore_index=True),
-        pd.concat(all_inventory, ignore_index=True),
-    )
 
+# Parquet copies need pyarrow; without it write_outputs writes only the CSVs
+WRITE_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+def _write_parquet(df: pd.DataFrame, path: Path):
+    """
+    CSV stays the interchange format (simulate_next_day appends to it); the
+    Parquet copy keeps real dates + the frames' categorical names (written
+    dictionary-encoded) for fast reloads.
+    """
+    typed = df.assign(date=pd.to_datetime(df["date"], format="%Y-%m-%d"))
+    typed.to_parquet(path, compression="zstd", index=False)
 
 def write_outputs(sales_df, marketing_df, inventory_df, out_dir="data"):
     out = Path(out_dir)
@@ -235,72 +245,98 @@ def write_outputs(sales_df, marketing_df, inventory_df, out_dir="data"):
     marketing_df.to_csv(marketing_path, index=False)
     inventory_df.to_csv(inventory_path, index=False)
 
+    # Typed Parquet copies, written after the CSVs so they start out as the fresher file
+    if WRITE_PARQUET:
+        for df, path in [(sales_df, sales_path), (marketing_df, marketing_path), (inventory_df, inventory_path)]:
+            _write_parquet(df, path.with_suffix(".parquet"))
+
     print("✅ Wrote:")
     print(f" - {sales_path} ({len(sales_df):,} rows)")
     print(f" - {marketing_path} ({len(marketing_df):,} rows)")
     print(f" - {inventory_path} ({len(inventory_df):,} rows)")
     
-def read_csv_if_exists(path: Path) -> pd.DataFrame:
-    if path.exists() and path.stat().st_size > 0:
-        return pd.read_csv(path)
-    return pd.DataFrame()
+def _load_checkpoint(path: Path, *sources: Path) -> dict | None:
+    # Stock checkpoint from the previous simulate_next_day; stale once any source
+    # CSV was written after it (e.g. a fresh write_outputs history)
+    if not path.exists():
+        return None
+    mtime = path.stat().st_mtime
+    if any(src.exists() and src.stat().st_mtime > mtime for src in sources):
+        return None
+    return json.loads(path.read_text())
 
 def simulate_next_day(data_dir="data", seed=None):
-    rng = np.random.default_rng(seed)
-
     data_dir = Path(data_dir)
     sales_path = data_dir / "sales.csv"
     marketing_path = data_dir / "marketing.csv"
     inventory_path = data_dir / "inventory.csv"
+    checkpoint_path = data_dir / "stock_state.json"
+
+    global START_DATE
+    checkpoint = _load_checkpoint(checkpoint_path, sales_path, inventory_path)
 
-    # --- Load existing data ---
-    sales_df = read_csv_if_exists(sales_path)
-    inventory_df = read_csv_if_exists(inventory_path)
+    if checkpoint is not None:
+        # --- Last date + stock from the checkpoint (no history read) ---
+        last_date = datetime.strptime(checkpoint["last_date"], "%Y-%m-%d")
+        stock_state = {p: int(v) for p, v in checkpoint["stock"].items()}
+        if START_DATE is None:
+            START_DATE = datetime.strptime(checkpoint["start_date"], "%Y-%m-%d")
 
-    if sales_df.empty or inventory_df.empty:
-        raise RuntimeError("❌ Cannot simulate next day without historical data.")
+    else:
+        # --- Load existing data ---
+        sales_df = read_table(sales_path)
+        inventory_df = read_table(inventory_path)
+
+        if sales_df.empty or inventory_df.empty:
+            raise RuntimeError("❌ Cannot simulate next day without historical data.")
 
-    # --- Determine last date ---
         # --- Determine last date ---
-    sales_df["date"] = pd.to_datetime(sales_df["date"])
-    inventory_df["date"] = pd.to_datetime(inventory_df["date"])
+        sales_df["date"] = pd.to_datetime(sales_df["date"])
+        inventory_df["date"] = pd.to_datetime(inventory_df["date"])
 
-    global START_DATE
-    if START_DATE is None:
-        START_DATE = inventory_df["date"].min().to_pydatetime()
+        if START_DATE is None:
+            START_DATE = inventory_df["date"].min().to_pydatetime()
 
+        last_date = sales_df["date"].max()
+
+        # --- Reconstruct stock state from last inventory snapshot ---
+        last_inventory = (
+            inventory_df.sort_values("date")
+            .groupby("product")
+            .tail(1)
+        )
+
+        stock_state = {
+            row["product"]: int(row["closing_stock"])
+            for _, row in last_inventory.iterrows()
+        }
 
-    last_date = sales_df["date"].max()
     next_date = last_date + timedelta(days=1)
 
+    # Stable per-day stream: (seed, day ordinal) mixed by SeedSequence, unlike
+    # hash() of a string, which is salted per process
     day_seed = (
-        hash((seed, next_date.strftime("%Y-%m-%d"))) % (2**32)
+        np.random.SeedSequence([seed, next_date.toordinal()])
         if seed is not None else None
     )
 
     rng = np.random.default_rng(day_seed)
 
-    # --- Reconstruct stock state from last inventory snapshot ---
-    
-    last_inventory = (
-        inventory_df.sort_values("date")
-        .groupby("product")
-        .tail(1)
-    )
-
-    stock_state = {
-        row["product"]: int(row["closing_stock"])
-        for _, row in last_inventory.iterrows()
-    }
-
     # --- Simulate one day ---
-    s, m, i, _ = simulate_day(next_date, stock_state, rng)
+    s, m, i, stock_state = simulate_day(next_date, stock_state, rng)
 
     # --- Append ---
     s.to_csv(sales_path, mode="a", header=False, index=False)
     m.to_csv(marketing_path, mode="a", header=False, index=False)
     i.to_csv(inventory_path, mode="a", header=False, index=False)
 
+    # --- Checkpoint (written last, so it is newer than the CSVs it summarizes) ---
+    checkpoint_path.write_text(json.dumps({
+        "last_date": next_date.strftime("%Y-%m-%d"),
+        "start_date": START_DATE.strftime("%Y-%m-%d"),
+        "stock": stock_state,
+    }))
+
     print(f"✅ Simulated next business day: {next_date.date()}")
 
 
@@ -23,200 +23,209 @@ BASE_DAILY_DEMAND = {
     "Nutrain Banana Oats": 60,
 }
 
-# -------------------------------
-# LOAD LAST DATE
-# -------------------------------
+# Config as arrays aligned to PRODUCTS, plus the product/region/channel
+# code of every allocation cell (product-major, channel fastest)
+BASE_ARR = np.array([BASE_DAILY_DEMAND[p] for p in PRODUCTS])
+PRICE_ARR = np.array([BASE_PRICE[p] for p in PRODUCTS])
+
+N_CELLS = len(PRODUCTS) * len(REGIONS) * len(CHANNELS)
+CELL_PRODUCT = np.repeat(np.arange(len(PRODUCTS)), len(REGIONS) * len(CHANNELS))
+CELL_REGION = np.tile(np.repeat(np.arange(len(REGIONS)), len(CHANNELS)), len(PRODUCTS))
+CELL_CHANNEL = np.tile(np.arange(len(CHANNELS)), len(PRODUCTS) * len(REGIONS))
 
 LIVE_PATH = "data/live/sales_live.csv"
+MARKETING_PATH = "data/live/marketing_live.csv"
+INVENTORY_PATH = "data/live/inventory_live.csv"
 
-last_date = None
 
-if os.path.exists(LIVE_PATH) and os.path.getsize(LIVE_PATH) > 0:
-    live_df = pd.read_csv(LIVE_PATH)
+def _append_csv(df: pd.DataFrame, path: str):
+    # Append-only: the header is written only when starting a new / empty file
+    header = not (os.path.exists(path) and os.path.getsize(path) > 0)
+    df.to_csv(path, mode="a", header=header, index=False)
 
-    if "date" in live_df.columns:
-        live_df["date"] = pd.to_datetime(live_df["date"], format="mixed", errors="coerce")
-        last_date = live_df["date"].max()
 
-# ✅ Fallback if file empty, missing dates, or NaT
-if last_date is None or pd.isna(last_date):
-    last_date = datetime(2024, 12, 31)
+def run_daily_sim():
+    """
+    Simulates the next live business day and writes it to the data/live CSVs.
+    """
 
-today = last_date + timedelta(days=1)
+    # -------------------------------
+    # LOAD LAST DATE
+    # -------------------------------
 
+    last_date = None
 
-# -------------------------------
-# SIMULATE DAY
-# -------------------------------
+    if os.path.exists(LIVE_PATH) and os.path.getsize(LIVE_PATH) > 0:
+        # Only the date column is needed to find where the live history ends
+        live_df = pd.read_csv(LIVE_PATH, usecols=lambda c: c == "date")
 
-rows = []
+        if "date" in live_df.columns:
+            live_df["date"] = pd.to_datetime(live_df["date"], format="mixed", errors="coerce")
+            last_date = live_df["date"].max()
 
-for product in PRODUCTS:
-    for region in REGIONS:
-        for channel in CHANNELS:
+    # ✅ Fallback if file empty, missing dates, or NaT
+    if last_date is None or pd.isna(last_date):
+        last_date = datetime(2024, 12, 31)
 
-            # Demand noise (realism)
-            demand_multiplier = np.random.normal(1.0, 0.15)
+    today = last_date + timedelta(days=1)
 
-            units = int(
-                BASE_DAILY_DEMAND[product]
-                * demand_multiplier
-                * np.random.uniform(0.7, 1.3)
-            )
 
-            units = max(units, 0)
+    # -------------------------------
+    # SIMULATE DAY
+    # -------------------------------
 
-            revenue = units * BASE_PRICE[product]
+    # Demand noise (realism), drawn for every cell at once
+    demand_multiplier = np.random.normal(1.0, 0.15, N_CELLS)
 
-            cac = round(np.random.uniform(25, 70), 2)
+    units = (
+        BASE_ARR[CELL_PRODUCT]
+        * demand_multiplier
+        * np.random.uniform(0.7, 1.3, N_CELLS)
+    ).astype(np.int64)
 
-            rows.append([
-                today.strftime("%Y-%m-%d"),
-                product,
-                region,
-                channel,
-                units,
-                revenue,
-                cac
-            ])
-day_df = pd.DataFrame(rows, columns=[
-    "date", "product", "region", "channel",
-    "units_sold", "revenue", "CAC"
-])
-# -------------------------------
-# MARKETING SIMULATION
-# -------------------------------
+    units = np.maximum(units, 0)
 
-MARKETING_PATH = "data/live/marketing_live.csv"
-marketing_rows = []
-
-for channel in CHANNELS:
-    # Total revenue attributed to this channel today
-    channel_revenue = day_df[day_df["channel"] == channel]["revenue"].sum()
-
-    # Spend as % of revenue (inefficient channels burn more)
-    spend_ratio = {
-        "Instagram": np.random.uniform(0.15, 0.25),
-        "Google": np.random.uniform(0.25, 0.45),
-        "Influencers": np.random.uniform(0.30, 0.50),
-    }[channel]
-
-    spend = round(channel_revenue * spend_ratio, 2)
-
-    # Funnel simulation
-    impressions = int(spend * np.random.uniform(80, 150))
-    ctr = np.random.uniform(0.8, 2.5) / 100
-    clicks = int(impressions * ctr)
-
-    conversion_rate = np.random.uniform(1.5, 4.0) / 100
-    conversions = int(clicks * conversion_rate)
-
-    marketing_rows.append([
-        today.strftime("%Y-%m-%d"),
-        channel,
-        spend,
-        impressions,
-        clicks,
-        conversions,
-        channel_revenue
-    ])
-
-marketing_df = pd.DataFrame(
-    marketing_rows,
-    columns=[
-        "date",
-        "channel",
-        "spend",
-        "impressions",
-        "clicks",
-        "conversions",
-        "revenue"
-    ]
-)
-
-if os.path.exists(MARKETING_PATH):
-    old = pd.read_csv(MARKETING_PATH)
-    if not old.empty:
-        marketing_df = pd.concat([old, marketing_df], ignore_index=True)
-
-marketing_df.to_csv(MARKETING_PATH, index=False)
+    revenue = units * PRICE_ARR[CELL_PRODUCT]
 
-# -------------------------------
-# INVENTORY SIMULATION
-# -------------------------------
+    cac = np.round(np.random.uniform(25, 70, N_CELLS), 2)
 
-INVENTORY_PATH = "data/live/inventory_live.csv"
-inventory_rows = []
-
-# Load previous inventory
-if os.path.exists(INVENTORY_PATH) and os.path.getsize(INVENTORY_PATH) > 0:
-    inv_df = pd.read_csv(INVENTORY_PATH)
-    last_stock = inv_df.groupby("product")["closing_stock"].last().to_dict()
-else:
-    last_stock = {p: 5000 for p in PRODUCTS}
-
-for product in PRODUCTS:
-    opening_stock = last_stock.get(product, 5000)
+    day_df = pd.DataFrame({
+        "date": today.strftime("%Y-%m-%d"),
+        "product": pd.Categorical.from_codes(CELL_PRODUCT, categories=PRODUCTS),
+        "region": pd.Categorical.from_codes(CELL_REGION, categories=REGIONS),
+        "channel": pd.Categorical.from_codes(CELL_CHANNEL, categories=CHANNELS),
+        "units_sold": units,
+        "revenue": revenue,
+        "CAC": cac,
+    })
 
-    units_sold_today = day_df[
-        day_df["product"] == product
-    ]["units_sold"].sum()
+    # -------------------------------
+    # MARKETING SIMULATION
+    # -------------------------------
 
-    # Simple production logic
-    units_produced = int(np.random.uniform(200, 500))
+    marketing_rows = []
 
-    units_dispatched = min(
-        opening_stock + units_produced,
-        units_sold_today
+    # Total revenue attributed to each channel today, aligned to CHANNELS
+    revenue_by_channel = (
+        day_df.groupby("channel", sort=False, observed=True)["revenue"].sum()
+        .reindex(CHANNELS, fill_value=0)
+        .to_numpy()
     )
 
-    closing_stock = (
-        opening_stock + units_produced - units_dispatched
+    for i, channel in enumerate(CHANNELS):
+        channel_revenue = revenue_by_channel[i]
+
+        # Spend as % of revenue (inefficient channels burn more)
+        spend_ratio = {
+            "Instagram": np.random.uniform(0.15, 0.25),
+            "Google": np.random.uniform(0.25, 0.45),
+            "Influencers": np.random.uniform(0.30, 0.50),
+        }[channel]
+
+        spend = round(channel_revenue * spend_ratio, 2)
+
+        # Funnel simulation
+        impressions = int(spend * np.random.uniform(80, 150))
+        ctr = np.random.uniform(0.8, 2.5) / 100
+        clicks = int(impressions * ctr)
+
+        conversion_rate = np.random.uniform(1.5, 4.0) / 100
+        conversions = int(clicks * conversion_rate)
+
+        marketing_rows.append([
+            today.strftime("%Y-%m-%d"),
+            channel,
+            spend,
+            impressions,
+            clicks,
+            conversions,
+            channel_revenue
+        ])
+
+    marketing_df = pd.DataFrame(
+        marketing_rows,
+        columns=[
+            "date",
+            "channel",
+            "spend",
+            "impressions",
+            "clicks",
+            "conversions",
+            "revenue"
+        ]
     )
 
-    inventory_rows.append([
-        today.strftime("%Y-%m-%d"),
-        product,
-        opening_stock,
-        units_produced,
-        units_dispatched,
-        closing_stock,
-        "Yes" if closing_stock <= 0 else "No"
-    ])
-
-inventory_df = pd.DataFrame(
-    inventory_rows,
-    columns=[
-        "date",
-        "product",
-        "opening_stock",
-        "units_produced",
-        "units_dispatched",
-        "closing_stock",
-        "stockout_flag"
-    ]
-)
-
-if os.path.exists(INVENTORY_PATH):
-    old = pd.read_csv(INVENTORY_PATH)
-    if not old.empty:
-        inventory_df = pd.concat([old, inventory_df], ignore_index=True)
-
-
-inventory_df.to_csv(INVENTORY_PATH, index=False)
+    _append_csv(marketing_df, MARKETING_PATH)
 
-# -------------------------------
-# APPEND TO LIVE DATA
-# -------------------------------
+    # -------------------------------
+    # INVENTORY SIMULATION
+    # -------------------------------
+
+    inventory_rows = []
+
+    # Load previous inventory
+    if os.path.exists(INVENTORY_PATH) and os.path.getsize(INVENTORY_PATH) > 0:
+        inv_df = pd.read_csv(INVENTORY_PATH, usecols=["product", "closing_stock"])
+        last_stock = inv_df.groupby("product")["closing_stock"].last().to_dict()
+    else:
+        last_stock = {p: 5000 for p in PRODUCTS}
+
+    units_by_product = (
+        day_df.groupby("product", sort=False, observed=True)["units_sold"].sum()
+        .reindex(PRODUCTS, fill_value=0)
+        .to_numpy()
+    )
+
+    for i, product in enumerate(PRODUCTS):
+        opening_stock = last_stock.get(product, 5000)
+
+        units_sold_today = units_by_product[i]
+
+        # Simple production logic
+        units_produced = int(np.random.uniform(200, 500))
+
+        units_dispatched = min(
+            opening_stock + units_produced,
+            units_sold_today
+        )
+
+        closing_stock = (
+            opening_stock + units_produced - units_dispatched
+        )
+
+        inventory_rows.append([
+            today.strftime("%Y-%m-%d"),
+            product,
+            opening_stock,
+            units_produced,
+            units_dispatched,
+            closing_stock,
+            "Yes" if closing_stock <= 0 else "No"
+        ])
+
+    inventory_df = pd.DataFrame(
+        inventory_rows,
+        columns=[
+            "date",
+            "product",
+            "opening_stock",
+            "units_produced",
+            "units_dispatched",
+            "closing_stock",
+            "stockout_flag"
+        ]
+    )
 
+    _append_csv(inventory_df, INVENTORY_PATH)
 
+    # -------------------------------
+    # APPEND TO LIVE DATA
+    # -------------------------------
 
-if live_df.empty:
-    final_df = day_df
-else:
-    final_df = pd.concat([live_df, day_df], ignore_index=True)
+    _append_csv(day_df, LIVE_PATH)
 
-final_df.to_csv(LIVE_PATH, index=False)
+    print(f"✅ Simulated business day: {today.date()}")
 
-print(f"✅ Simulated business day: {today.date()}")
 
+if __name__ == "__main__":
+    run_daily_sim()
@@ -1,19 +1,54 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import asyncio
+import threading
+import time
+
 import streamlit as st
-from agent.agent import run_ceo_agent
+from agent.agent import stream_ceo_agent
 
 
+_DONE = object()
 
-st.set_page_config(page_title="AUTO", layout="wide")
 
-# ---------- Session Memory ----------
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+@st.cache_resource
+def _agent_loop():
+    """
+    One long-lived event loop per process, run on a daemon thread.
+    The agent's pooled OpenAI client is bound to the loop it runs on, so every
+    stream (brief and chat, across reruns and sessions) must go through this one.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+async def _next(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _DONE
+
+
+def _stream(conversation):
+    """Drive the async agent stream from Streamlit's sync script thread."""
+    loop = _agent_loop()
+    agen = stream_ceo_agent(conversation)
+    try:
+        while True:
+            chunk = asyncio.run_coroutine_threadsafe(_next(agen), loop).result()
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
 
-# ---------- Global Clean Styling ----------
-st.markdown("""
+
+# ---------- Static page markup ----------
+# Built once at import; Streamlit drops elements a rerun does not emit, so
+# these are still sent on every run, but as a single element.
+_CSS = """
 <style>
 body {
     background: #FAFAFA;
@@ -43,10 +78,9 @@ body {
     color: #0B0B0B;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# ---------- Header ----------
-st.markdown("""
+_HEADER = """
 <h2 style="
 font-weight:600;
 letter-spacing:2px;
@@ -62,7 +96,39 @@ letter-spacing:1px;
 opacity:0.6;">
 Autonomous executive intelligence
 </p>
-""", unsafe_allow_html=True)
+"""
+
+
+BRIEF_PROMPT = [{"role": "user", "content": "Generate today’s executive brief."}]
+BRIEF_TTL_SECONDS = 3600
+
+
+@st.cache_resource
+def _brief_store():
+    """Process-wide {"text", "created_at"} so new sessions reuse a recent brief."""
+    return {}
+
+
+def _render_brief():
+    """Show the cached brief, or stream a fresh one and cache it."""
+    store = _brief_store()
+    if store and time.time() - store["created_at"] < BRIEF_TTL_SECONDS:
+        st.markdown(store["text"])
+        return store["text"]
+
+    text = st.write_stream(_stream(BRIEF_PROMPT))
+    store.update(text=text, created_at=time.time())
+    return text
+
+
+st.set_page_config(page_title="AUTO", layout="wide")
+
+# ---------- Session Memory ----------
+if "messages" not in st.session_state:
+    st.session_state.messages = []
+
+# ---------- Global Clean Styling + Header ----------
+st.markdown(_CSS + _HEADER, unsafe_allow_html=True)
 
 # ---------- Sidebar ----------
 st.sidebar.markdown("### System")
@@ -73,19 +139,10 @@ st.sidebar.markdown("**Currency:** ₹ INR")
 if st.sidebar.button("Reset Memory"):
     st.session_state.messages = []
     st.rerun()
-    
-if "auto_brief_shown" not in st.session_state:
-    st.session_state.auto_brief_shown = True
-
-    with st.spinner("AUTO initializing..."):
-        brief = run_ceo_agent([
-            {"role": "user", "content": "Generate today’s executive brief."}
-        ])
-
-    with st.chat_message("assistant"):
-        st.markdown(brief)
-
 
+# ---------- Executive Brief ----------
+# Slot reserved at the top; filled after the rest of the page has rendered
+brief_slot = st.container()
 
 # ---------- Chat History ----------
 for msg in st.session_state.messages:
@@ -99,12 +156,22 @@ for msg in st.session_state.messages:
 # ---------- Input ----------
 query = st.chat_input("Command AUTO")
 
+with brief_slot:
+    with st.chat_message("assistant"):
+        if "brief" in st.session_state:
+            st.markdown(st.session_state.brief)
+        else:
+            st.session_state.brief = _render_brief()
+
 if query:
     st.session_state.messages.append({"role": "user", "content": query})
 
-    with st.spinner("Processing"):
-        response = run_ceo_agent(st.session_state.messages)
+    with st.chat_message("user"):
+        st.markdown(query)
+
+    with st.chat_message("assistant"):
+        response = st.write_stream(_stream(st.session_state.messages))
 
+    # Already on screen; the next run renders it from history
     st.session_state.messages.append({"role": "assistant", "content": response})
-    st.rerun()
 